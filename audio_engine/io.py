@@ -1,13 +1,30 @@
-import ffmpeg
+import json
 import os
+import subprocess
+from functools import lru_cache
 from typing import Dict, Any
 
+@lru_cache(maxsize=128)
+def _probe_cached(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """
+    ffprobe keyed by file identity; mtime_ns/size invalidate the entry when the file changes.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        path
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return json.loads(result.stdout)
+
 def get_media_info(path: str) -> Dict[str, Any]:
     """
-    Returns media info using ffprobe.
+    Returns media info using ffprobe (cached per path, mtime and size).
     """
     try:
-        probe = ffmpeg.probe(path)
+        st = os.stat(path)
+        probe = _probe_cached(path, st.st_mtime_ns, st.st_size)
         # Find audio stream
         audio_streams = [s for s in probe['streams'] if s['codec_type'] == 'audio']
         if not audio_streams:
@@ -24,6 +41,6 @@ def get_media_info(path: str) -> Dict[str, Any]:
             "channels": int(info.get('channels', 1)),
             "codec": info.get('codec_name')
         }
-    except ffmpeg.Error as e:
-        print("ffmpeg error:", e.stderr)
+    except subprocess.CalledProcessError as e:
+        print("ffprobe error:", e.stderr)
         raise
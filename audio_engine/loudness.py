@@ -1,17 +1,63 @@
-import ffmpeg
-from .metrics import measure_loudness
+from .metrics import measure_loudness, parse_loudnorm_output, run_ffmpeg
 import logging
 
 logger = logging.getLogger(__name__)
 
-def normalize_audio(input_path: str, output_path: str, target_lufs: float = -14.0, true_peak: float = -1.0, dual_mono: bool = False):
+def _output_args(output_path: str) -> list:
+    # We use a standard high quality audio codec, e.g., aac or just copy container default if wav
+    # For simplicity, if output ends in .mp3 use libmp3lame, if .wav use pcm_s24le or similar
+    output_args = []
+    if output_path.endswith('.mp3'):
+        output_args += ["-c:a", "libmp3lame", "-b:a", "256k"]
+    elif output_path.endswith('.wav'):
+        # preserve high quality
+        pass
+    return output_args
+
+def _loudnorm_cmd(input_path: str, output_path: str, params: dict) -> list:
+    loudnorm = "loudnorm=" + ":".join(f"{k}={v}" for k, v in params.items())
+    return [
+        "ffmpeg", "-y", "-hide_banner", "-nostats", "-loglevel", "info",
+        "-i", input_path,
+        "-af", loudnorm,
+        *_output_args(output_path),
+        output_path
+    ]
+
+def normalize_audio(input_path: str, output_path: str, target_lufs: float = -14.0, true_peak: float = -1.0, dual_mono: bool = False, one_pass: bool = False, fast_peak: bool = False):
     """
-    Performs 2-pass Loudness Normalization to meet target_lufs and true_peak.
+    Performs Loudness Normalization to meet target_lufs and true_peak.
+    
+    By default runs 2-pass (measure, then apply with measured values) for accuracy.
+    With one_pass=True a single dynamic loudnorm run is used, which skips the
+    measurement decode.
+    
+    fast_peak=True measures sample peak instead of true peak in the 1st pass.
+    Sample peak understates true peak, so it is not passed as measured_TP and
+    the apply pass runs in dynamic mode (no linear=true), keeping loudnorm's
+    true-peak limiter active so the output stays under true_peak.
+    
+    Returns the input_* measurements plus the output_* stats printed by the
+    applying pass (output_* keys are missing if ffmpeg's stats could not be parsed).
     """
     
+    if dual_mono:
+        # TODO: Split channels, norm independently, merge. Complex filter graph.
+        # For M1 we skip strictly implementing dual mono and log a warning
+        logger.warning("Dual Mono requested but not yet implemented in M1. Using stereo coupled.")
+    
+    if one_pass:
+        logger.info(f"Normalizing {input_path} (one-pass)...")
+        params = {'I': target_lufs, 'TP': true_peak, 'LRA': 11, 'print_format': 'json'}
+        err = run_ffmpeg(_loudnorm_cmd(input_path, output_path, params))
+        
+        measurements = parse_loudnorm_output(err)
+        logger.info(f"Measurements: {measurements}")
+        return measurements
+    
     # Pass 1: Measure
     logger.info(f"Measuring {input_path}...")
-    measurements = measure_loudness(input_path)
+    measurements = measure_loudness(input_path, peak_mode='sample' if fast_peak else 'true')
     
     logger.info(f"Measurements: {measurements}")
     
@@ -27,8 +73,6 @@ def normalize_audio(input_path: str, output_path: str, target_lufs: float = -14.
     # LRA: loudness range target (default 7.0 is usually fine for speech, but we can stick to defaults)
     # measured_I, measured_TP, measured_LRA, measured_thresh from pass 1
     
-    stream = ffmpeg.input(input_path)
-    
     loudnorm_params = {
         'I': target_lufs,
         'TP': true_peak,
@@ -36,31 +80,27 @@ def normalize_audio(input_path: str, output_path: str, target_lufs: float = -14.
         'measured_TP': measurements['input_tp'],
         'measured_LRA': measurements['input_lra'],
         'measured_thresh': measurements['input_thresh'],
-        'offset': measurements['target_offset'],
+        'offset': measurements.get('target_offset', 0.0), # ebur128 measurements carry no offset
         'linear': 'true', # linear normalization recommended for 2nd pass
-        'print_format': 'summary'
+        'print_format': 'json' # 2nd pass prints output_* stats, saves a verification decode
     }
-    
-    if dual_mono:
-        # TODO: Split channels, norm independently, merge. Complex filter graph.
-        # For M1 we skip strictly implementing dual mono and log a warning
-        logger.warning("Dual Mono requested but not yet implemented in M1. Using stereo coupled.")
+    if fast_peak:
+        # Linear mode trusts measured_TP to decide that no limiting is needed;
+        # a sample peak would let true peaks through, so stay dynamic instead
+        del loudnorm_params['measured_TP']
+        del loudnorm_params['linear']
         
-    stream = ffmpeg.filter(stream, 'loudnorm', **loudnorm_params)
+    err = run_ffmpeg(_loudnorm_cmd(input_path, output_path, loudnorm_params))
     
-    # Output
-    # We use a standard high quality audio codec, e.g., aac or just copy container default if wav
-    # For simplicity, if output ends in .mp3 use libmp3lame, if .wav use pcm_s24le or similar
-    
-    output_kwargs = {}
-    if output_path.endswith('.mp3'):
-        output_kwargs['acodec'] = 'libmp3lame'
-        output_kwargs['audio_bitrate'] = '256k'
-    elif output_path.endswith('.wav'):
-        # preserve high quality
-        pass
+    try:
+        applied = parse_loudnorm_output(err)
+    except ValueError:
+        # Caller falls back to re-measuring the output file
+        logger.warning("Could not parse 2nd pass loudnorm stats")
+        return measurements
     
-    stream = ffmpeg.output(stream, output_path, **output_kwargs)
-    ffmpeg.run(stream, overwrite_output=True)
+    for key in ('output_i', 'output_tp', 'output_lra', 'output_thresh'):
+        if key in applied:
+            measurements[key] = applied[key]
     
     return measurements
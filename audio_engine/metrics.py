@@ -1,49 +1,205 @@
-import ffmpeg
+import hashlib
 import json
 import logging
+import os
+import re
+import subprocess
 import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
 
 # Configure logging to capture ffmpeg output if needed
 logger = logging.getLogger(__name__)
 
-def measure_loudness(path: str) -> dict:
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Loudness measurements of input files persisted across runs, one entry per (path, peak_mode)
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "temp", ".probe_cache.json")
+# Least recently stored entries are dropped beyond this
+CACHE_MAX_ENTRIES = 256
+_loudness_cache = None
+
+def _cache_key(path: str, peak_mode: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return f"{digest}:{peak_mode}"
+
+def _file_id(path: str) -> list:
+    """mtime/size identity; a cached entry is only valid while these match."""
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+def _read_cache_file() -> dict:
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    # Drop anything not in the {"id": ..., "data": ...} entry format
+    return {k: v for k, v in data.items() if isinstance(v, dict) and "id" in v and "data" in v}
+
+def _load_cache() -> dict:
+    global _loudness_cache
+    if _loudness_cache is None:
+        _loudness_cache = _read_cache_file()
+    return _loudness_cache
+
+@contextmanager
+def _cache_file_lock():
+    """Serialize read-merge-write of CACHE_PATH across worker processes (no-op on Windows)."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{CACHE_PATH}.lock", "a") as lock_f:
+        fcntl.flock(lock_f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_f.fileno(), fcntl.LOCK_UN)
+
+def _store_cache_entry(key: str, entry: dict):
     """
-    Runs a 1st pass loudnorm filter to measure Input Integrated Loudness, True Peak, LRA, and Threshold.
-    Returns a dict with keys: input_i, input_tp, input_lra, input_thresh, target_offset.
+    Merge one entry into CACHE_PATH and the in-memory cache.
+    The file is re-read under a lock first, so entries written by other
+    processes since this one loaded the cache are kept.
     """
+    cache = _load_cache()
     try:
-        # We run the loudnorm filter with print_format=json.
-        # It doesn't output a file, so we map to null.
-        # We must capture stderr to get the json output.
-        stream = ffmpeg.input(path)
-        stream = ffmpeg.output(stream, '-', f='null', af='loudnorm=print_format=json')
-        out, err = ffmpeg.run(stream, capture_stdout=True, capture_stderr=True)
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        with _cache_file_lock():
+            merged = _read_cache_file()
+            merged.pop(key, None)
+            merged[key] = entry
+            while len(merged) > CACHE_MAX_ENTRIES:
+                del merged[next(iter(merged))]
+            
+            tmp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(merged, f)
+            os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Could not persist loudness cache: {e}")
+        cache.pop(key, None)
+        cache[key] = entry
+        return
+    
+    cache.clear()
+    cache.update(merged)
+
+# loudnorm's print_format=json block; matched on raw stderr bytes, no per-line scanning
+_JSON_RE = re.compile(rb'\{[^{}]*"input_i"[^{}]*\}')
+
+def parse_loudnorm_output(stderr_output: bytes) -> dict:
+    """
+    Extracts the JSON block printed by loudnorm (print_format=json) from ffmpeg stderr.
+    Raises ValueError if no JSON block is found.
+    """
+    # The JSON output is usually at the end of stderr, so take the last match
+    json_block = None
+    for match in _JSON_RE.finditer(stderr_output):
+        json_block = match.group()
+    
+    if json_block is None:
+        logger.error(f"Could not find JSON in ffmpeg output: {stderr_output.decode('utf-8', errors='replace')}")
+        raise ValueError("Could not measure loudness: No JSON output from ffmpeg")
         
-        # Parse stderr for the JSON block
-        stderr_output = err.decode('utf-8')
+    return json.loads(json_block)
+
+# ebur128 prints a Summary block at the end of the run
+_EBUR128_I_RE = re.compile(rb'I:\s*(-?[\d.]+|-inf)\s*LUFS\s*Threshold:\s*(-?[\d.]+|-inf)\s*LUFS')
+_EBUR128_LRA_RE = re.compile(rb'LRA:\s*(-?[\d.]+)\s*LU\b')
+_EBUR128_PEAK_RE = re.compile(rb'Peak:\s*(-?[\d.]+|-inf)\s*dBFS')
+
+def parse_ebur128_summary(stderr_output: bytes) -> dict:
+    """
+    Extracts integrated loudness, threshold, LRA and true peak from the ebur128 Summary block.
+    Returns a dict with keys: input_i, input_tp, input_lra, input_thresh (strings, like loudnorm's JSON).
+    Raises ValueError if the summary is missing.
+    """
+    summary = stderr_output[stderr_output.rfind(b'Summary:'):]
+    i_match = _EBUR128_I_RE.search(summary)
+    lra_match = _EBUR128_LRA_RE.search(summary)
+    peak_match = _EBUR128_PEAK_RE.search(summary)
+    
+    if not (i_match and lra_match and peak_match):
+        logger.error(f"Could not find ebur128 summary in ffmpeg output: {stderr_output.decode('utf-8', errors='replace')}")
+        raise ValueError("Could not measure loudness: No ebur128 summary from ffmpeg")
+    
+    return {
+        "input_i": i_match.group(1).decode(),
+        "input_tp": peak_match.group(1).decode(),
+        "input_lra": lra_match.group(1).decode(),
+        "input_thresh": i_match.group(2).decode()
+    }
+
+# stderr is kept as a trailing window of fixed-size chunks (256 x 4 KiB = 1 MiB cap)
+_STDERR_CHUNK = 4096
+
+def run_ffmpeg(cmd: list, tail_chunks: int = 256) -> bytes:
+    """
+    Runs an ffmpeg argv keeping only the trailing tail_chunks * 4 KiB of stderr in memory.
+    Returns the stderr tail; raises subprocess.CalledProcessError on a non-zero exit.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    tail = deque(maxlen=tail_chunks)
+    chunks = iter(partial(proc.stderr.read1, _STDERR_CHUNK), b'')
+    reader = threading.Thread(target=tail.extend, args=(chunks,), daemon=True)
+    reader.start()
+    proc.wait()
+    reader.join()
+    
+    err = b''.join(tail)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=err)
+    return err
+
+def measure_loudness(path: str, peak_mode: str = 'true', persist: bool = True) -> dict:
+    """
+    Runs an ebur128 pass to measure Input Integrated Loudness, True Peak, LRA, and Threshold.
+    ebur128 is an order of magnitude faster than loudnorm when only the stats are needed.
+    peak_mode='sample' skips true-peak oversampling (several times faster); input_tp is then the sample peak.
+    Returns a dict with keys: input_i, input_tp, input_lra, input_thresh.
+    With persist=True results are cached in CACHE_PATH per (path, peak_mode) and reused
+    while the file's mtime and size are unchanged; use persist=False for files that are
+    written fresh every run (job outputs), which would only grow the cache.
+    """
+    if peak_mode not in ('true', 'sample'):
+        raise ValueError(f"Invalid peak_mode: {peak_mode}")
+    
+    if persist:
+        cache = _load_cache()
+        key = _cache_key(path, peak_mode)
+        file_id = _file_id(path)
+        entry = cache.get(key)
+        if entry is not None and entry["id"] == file_id:
+            return dict(entry["data"])
+    
+    try:
+        # We run the ebur128 filter; framelog=verbose keeps per-frame lines out of stderr.
+        # It doesn't output a file, so we map to null.
+        # We must capture stderr to get the summary (only its tail is kept).
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "info",
+            "-i", path,
+            "-map", "0:a:0", "-vn",
+            "-af", f"ebur128=peak={peak_mode}:framelog=verbose",
+            "-f", "null", "-"
+        ]
+        err = run_ffmpeg(cmd)
         
-        # The JSON output is usually at the end of stderr
-        # We look for the formatted json structure
-        lines = stderr_output.split('\n')
-        json_str = ""
-        in_json = False
-        for line in lines:
-            if line.strip() == '{':
-                in_json = True
-                json_str += "{\n"
-                continue
-            if in_json:
-                json_str += line + "\n"
-                if line.strip() == '}':
-                    break
+        # Parse stderr for the Summary block
+        data = parse_ebur128_summary(err)
         
-        if not json_str:
-            logger.error(f"Could not find JSON in ffmpeg output: {stderr_output}")
-            raise ValueError("Could not measure loudness: No JSON output from ffmpeg")
-            
-        data = json.loads(json_str)
-        return data
+        if persist:
+            _store_cache_entry(key, {"id": file_id, "data": data})
+        return dict(data)
         
-    except ffmpeg.Error as e:
-        logger.error(f"FFmpeg Error: {e.stderr.decode('utf-8') if e.stderr else 'Unknown'}")
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg Error: {e.stderr.decode('utf-8', errors='replace') if e.stderr else 'Unknown'}")
         raise
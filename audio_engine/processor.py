@@ -2,7 +2,11 @@ import os
 import shutil
 import uuid
 import logging
-from typing import Dict, Any
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, List, Optional
 from .loudness import normalize_audio
 from .metrics import measure_loudness
 
@@ -13,12 +17,21 @@ OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "output")
 os.makedirs(TEMP_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def run_job(input_path: str, preset: Dict[str, Any]) -> Dict[str, Any]:
+# Returned when a file was not measured (loudness disabled)
+UNMEASURED = {'input_i': None, 'input_tp': None, 'input_lra': None}
+
+def _to_float(value):
+    """ffmpeg reports stats as JSON strings; convert once, pass other values through."""
+    return float(value) if isinstance(value, str) else value
+
+def run_job(input_path: str, preset: Dict[str, Any], output_dir: Optional[str] = None) -> Dict[str, Any]:
     """
     Orchestrates the processing job:
     1. Reads preset config
     2. Runs pipeline (currently just Loudness)
     3. Generates report
+    
+    Output is written to output_dir (default: OUTPUT_DIR).
     """
     job_id = str(uuid.uuid4())
     logger.info(f"Starting job {job_id} for {input_path}")
@@ -43,10 +56,14 @@ def run_job(input_path: str, preset: Dict[str, Any]) -> Dict[str, Any]:
     # Prepare output path
     filename = os.path.basename(input_path)
     output_filename = f"processed_{filename}"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = os.path.join(output_dir or OUTPUT_DIR, output_filename)
     
+    # One-pass trades a little accuracy for skipping the measurement decode
+    one_pass = bool(loudness_algo.get('one_pass', False))
+
     # Execute Pipeline
     # M1: Just Loudness Normalization
+    final_measurements = None
     if loudness_algo.get('enabled', True):
         # We start with normalization
         # Note: In a full chain, this is usually last. But for M1 it's the only step.
@@ -55,34 +72,83 @@ def run_job(input_path: str, preset: Dict[str, Any]) -> Dict[str, Any]:
             output_path=output_path,
             target_lufs=target_lufs,
             true_peak=true_peak,
-            dual_mono=loudness_algo.get('dual_mono', False)
+            dual_mono=loudness_algo.get('dual_mono', False),
+            one_pass=one_pass,
+            fast_peak=bool(loudness_algo.get('fast_measure', False))
         )
+        if 'output_i' in initial_measurements:
+            # The applying loudnorm pass already printed the output stats
+            final_measurements = {
+                'input_i': initial_measurements['output_i'],
+                'input_tp': initial_measurements['output_tp'],
+                'input_lra': initial_measurements['output_lra']
+            }
     else:
         # Just copy if disabled (unlikely for "Loudness Normalization" focus, but good for robustness)
+        # The input is reported as unmeasured rather than spending a decode on it
         shutil.copy(input_path, output_path)
-        initial_measurements = measure_loudness(input_path) # measure anyway for report
+        initial_measurements = UNMEASURED
 
-    # Measure Output for verification
-    final_measurements = measure_loudness(output_path)
+    # Measure Output for verification (only if normalization didn't report it)
+    if final_measurements is None:
+        # Outputs are rewritten every run, so keep them out of the persistent cache
+        final_measurements = measure_loudness(output_path, persist=False)
     
     # Construct Report
     return {
         "job_id": job_id,
         "input": {
             "file": filename,
-            "lufs": float(initial_measurements['input_i']),
-            "true_peak": float(initial_measurements['input_tp']),
-            "lra": float(initial_measurements['input_lra'])
+            "measured": initial_measurements is not UNMEASURED,
+            "lufs": _to_float(initial_measurements['input_i']),
+            "true_peak": _to_float(initial_measurements['input_tp']),
+            "lra": _to_float(initial_measurements['input_lra'])
         },
         "output": {
             "file": output_filename,
             "path": output_path, # Local path for now
-            "lufs": float(final_measurements['input_i']),
-            "true_peak": float(final_measurements['input_tp']),
-            "lra": float(final_measurements['input_lra'])
+            "lufs": _to_float(final_measurements['input_i']),
+            "true_peak": _to_float(final_measurements['input_tp']),
+            "lra": _to_float(final_measurements['input_lra'])
         },
         "targets": {
             "lufs": target_lufs,
             "true_peak": true_peak
         }
     }
+
+
+def _init_worker(log_queue, level: int):
+    """Route worker logging through the parent's handlers."""
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(level)
+
+def run_jobs(inputs: List[str], preset: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Runs run_job for a batch of files across a process pool.
+    
+    Each job writes into its own subdirectory of OUTPUT_DIR so inputs sharing
+    a basename don't clobber each other. Reports are returned in input order.
+    """
+    # ffmpeg is partly multi-threaded itself, so only use half the cores
+    max_workers = max(1, (os.cpu_count() or 2) // 2)
+    
+    root = logging.getLogger()
+    log_queue = multiprocessing.Queue()
+    listener = QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    listener.start()
+    
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(log_queue, root.level)
+        ) as pool:
+            futures = [
+                pool.submit(run_job, path, preset, tempfile.mkdtemp(prefix="job_", dir=OUTPUT_DIR))
+                for path in inputs
+            ]
+            return [f.result() for f in futures]
+    finally:
+        listener.stop()
@@ -10,13 +10,22 @@ Features:
 - Gentle compression for consistent levels
 """
 
-import subprocess
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from audio_engine.metrics import parse_ebur128_summary
 
 from .base_agent import BaseAgent
 
 
+# Container duration and first video stream size from the input header, printed in the same run
+_DURATION_RE = re.compile(rb'Duration:\s*(\d+):(\d{2}):(\d{2}(?:\.\d+)?)')
+_VIDEO_SIZE_RE = re.compile(rb'Video: [^\n]*?, (\d+)x(\d+)[ ,\r\n]')
+
+
 class AudioProcessorAgent(BaseAgent):
     """
     Processes audio: EQ, compression, and loudness normalization.
@@ -29,11 +38,33 @@ class AudioProcessorAgent(BaseAgent):
         compression_ratio: Compression ratio (default: 3)
         presence_boost_hz: Presence EQ center (default: 3000)
         presence_boost_db: Presence boost amount (default: 2)
+        output_codec: flac or pcm_s16le (default: flac)
     """
     
+    # codec -> (FFmpeg args, file suffix). FLAC level 0 is lossless at
+    # roughly half the bytes of PCM and just as cheap to decode.
+    OUTPUT_CODECS = {
+        "flac": (["-c:a", "flac", "-compression_level", "0"], ".flac"),
+        "pcm_s16le": (["-c:a", "pcm_s16le"], ".wav"),
+    }
+    
+    # Config keys the filter chain depends on (cache key for the built chain)
+    FILTER_CONFIG_KEYS = (
+        "highpass_hz", "lowpass_hz", "presence_boost_hz", "presence_boost_db",
+        "compression_threshold_db", "compression_ratio", "target_loudness_lufs",
+    )
+    
+    def __init__(self, config: Dict[str, Any], logger: Optional[logging.Logger] = None):
+        super().__init__(config, logger)
+        self._filter_chain: Optional[str] = None
+        self._filter_chain_key: Optional[tuple] = None
+    
     def _build_filter_chain(self) -> str:
-        """Build FFmpeg audio filter chain from config."""
+        """Build FFmpeg audio filter chain from config (memoized until the config changes)."""
         cfg = self.config
+        key = tuple(cfg.get(k) for k in self.FILTER_CONFIG_KEYS)
+        if self._filter_chain is not None and key == self._filter_chain_key:
+            return self._filter_chain
         
         filters = [
             # Highpass - remove rumble
@@ -49,35 +80,48 @@ class AudioProcessorAgent(BaseAgent):
             f"loudnorm=I={cfg.get('target_loudness_lufs', -16)}:TP=-1.5:LRA=11",
         ]
         
-        return ",".join(filters)
+        self._filter_chain = ",".join(filters)
+        self._filter_chain_key = key
+        self.logger.debug(f"Filter chain: {self._filter_chain}")
+        return self._filter_chain
     
     def _get_loudness_stats(self, audio_path: Path) -> Dict[str, float]:
-        """Analyze audio loudness using FFmpeg."""
+        """
+        Analyze audio loudness using FFmpeg's ebur128 filter (much faster than loudnorm).
+        The input's container duration ("duration") and first video stream size
+        ("video_size", [width, height]) are included when ffmpeg reports them.
+        """
         cmd = [
-            "ffmpeg", "-hide_banner", "-i", str(audio_path),
-            "-af", "loudnorm=print_format=json",
+            "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "info",
+            "-i", str(audio_path),
+            "-map", "0:a:0", "-vn",  # Only demux the audio stream
+            "-af", "ebur128=peak=true:framelog=verbose",
             "-f", "null", "-"
         ]
         
+        stats = {}
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            # Parse loudnorm JSON from stderr
-            import json
-            import re
+            result = self._run_capped(cmd, timeout=60, text=False)
+            # Parse the ebur128 Summary block from stderr
+            try:
+                summary = parse_ebur128_summary(result.stderr)
+            except ValueError:
+                pass
+            else:
+                stats = {key: float(summary[key]) for key in ("input_i", "input_tp", "input_lra")}
+            
+            duration_match = _DURATION_RE.search(result.stderr)
+            if duration_match:
+                hours, minutes, seconds = duration_match.groups()
+                stats["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
             
-            # Find JSON block in output
-            json_match = re.search(r'\{[^{}]+\}', result.stderr, re.DOTALL)
-            if json_match:
-                stats = json.loads(json_match.group())
-                return {
-                    "input_i": float(stats.get("input_i", 0)),
-                    "input_tp": float(stats.get("input_tp", 0)),
-                    "input_lra": float(stats.get("input_lra", 0)),
-                }
+            size_match = _VIDEO_SIZE_RE.search(result.stderr)
+            if size_match:
+                stats["video_size"] = [int(size_match.group(1)), int(size_match.group(2))]
         except Exception as e:
             self.logger.warning(f"Could not get loudness stats: {e}")
         
-        return {}
+        return stats
     
     def _execute(self, input_path: Path, output_dir: Path) -> Dict[str, Any]:
         """
@@ -85,35 +129,43 @@ class AudioProcessorAgent(BaseAgent):
         
         Returns:
             {
-                "output_path": str - Path to processed audio file,
-                "loudness_stats": dict - Pre/post processing stats
+                "output_path": str - Path to processed audio file (FLAC or WAV),
+                "loudness_stats": dict - Pre/post processing stats,
+                "input_duration": float or None - Input duration in seconds,
+                "input_video_size": [width, height] or None - Input video dimensions
             }
         """
         self.validate_input(input_path)
         
-        output_path = output_dir / f"{input_path.stem}_audio_normalized.wav"
+        codec = self.config.get("output_codec", "flac")
+        if codec not in self.OUTPUT_CODECS:
+            raise ValueError(f"Unsupported audio output codec: {codec}")
+        codec_args, suffix = self.OUTPUT_CODECS[codec]
+        
+        output_path = output_dir / f"{input_path.stem}_audio_normalized{suffix}"
         filter_chain = self._build_filter_chain()
         
         self.logger.info(f"Extracting and processing audio from {input_path.name}")
-        self.logger.debug(f"Filter chain: {filter_chain}")
-        
-        # Get pre-processing stats
-        pre_stats = self._get_loudness_stats(input_path)
         
         # Process audio
         cmd = [
             "ffmpeg", "-y", "-hide_banner",
             "-i", str(input_path),
-            "-vn",  # No video
+            "-map", "0:a:0",  # Audio stream only, skips the video path entirely
+            "-threads", "0",
             "-af", filter_chain,
             "-ar", "48000",  # 48kHz sample rate
             "-ac", "2",  # Stereo
-            "-c:a", "pcm_s16le",  # WAV format
+            *codec_args,
             "-loglevel", "error",
             str(output_path)
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        # Pre-processing stats only read the input, so scan it while processing runs
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pre_stats_future = pool.submit(self._get_loudness_stats, input_path)
+            result = self._run_ffmpeg(cmd)
+            pre_stats = pre_stats_future.result()
         
         if result.returncode != 0:
             raise RuntimeError(f"FFmpeg audio processing failed: {result.stderr}")
@@ -123,6 +175,10 @@ class AudioProcessorAgent(BaseAgent):
         
         # Get post-processing stats
         post_stats = self._get_loudness_stats(output_path)
+        input_duration = pre_stats.pop("duration", None)
+        input_video_size = pre_stats.pop("video_size", None)
+        post_stats.pop("duration", None)
+        post_stats.pop("video_size", None)
         
         self.logger.info(f"Audio processed successfully: {output_path.name}")
         
@@ -132,5 +188,7 @@ class AudioProcessorAgent(BaseAgent):
                 "pre": pre_stats,
                 "post": post_stats,
                 "target_lufs": self.config.get("target_loudness_lufs", -16)
-            }
+            },
+            "input_duration": input_duration,
+            "input_video_size": input_video_size
         }
@@ -9,15 +9,27 @@ Features:
 - Stub for Cloud Upload
 """
 
+import itertools
+import logging
+import os
 import shutil
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
-import time # For stub
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 from .base_agent import BaseAgent
 
 
+# Linux ioctl that clones file extents copy-on-write (btrfs, XFS)
+FICLONE = 0x40049409
+
+
 class BackupManagerAgent(BaseAgent):
     """
     Manages file backups with retention policy.
@@ -27,8 +39,19 @@ class BackupManagerAgent(BaseAgent):
         backup_dir: Directory for backups (default: .backups)
         retention_days: Days to keep backups (default: 7)
         upload_to_drive: Enable cloud upload stub (default: False)
+        allow_hardlink: Hardlink backups on the same filesystem when reflink
+            is unavailable (default: False). A hardlinked backup shares data
+            with the original, so in-place edits to the original show up in
+            it; only enable this for sources that are never modified in place.
     """
     
+    MAX_NAME_ATTEMPTS = 100
+    
+    def __init__(self, config: Dict[str, Any], logger: Optional[logging.Logger] = None):
+        super().__init__(config, logger)
+        self._last_backup_ts: Optional[str] = None
+        self._backup_seq = itertools.count(1)
+    
     def _get_backup_dir(self, output_dir: Path) -> Path:
         """Get or create backup directory."""
         backup_dirname = self.config.get("backup_dir", ".backups")
@@ -37,51 +60,106 @@ class BackupManagerAgent(BaseAgent):
         return backup_dir
     
     def _generate_backup_name(self, original_path: Path) -> str:
-        """Generate timestamped backup filename."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        """Generate timestamped backup filename (sequence-suffixed within the same second)."""
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        if timestamp == self._last_backup_ts:
+            timestamp = f"{timestamp}_{next(self._backup_seq):04d}"
+        else:
+            self._last_backup_ts = timestamp
+            self._backup_seq = itertools.count(1)
         return f"{original_path.stem}_{timestamp}{original_path.suffix}"
     
-    def _cleanup_old_backups(self, backup_dir: Path) -> int:
-        """Remove backups older than retention period."""
+    def _fast_copy(self, src: Path, dst: Path) -> str:
+        """
+        Copy src to dst as cheaply as the filesystem allows.
+        
+        Tries a copy-on-write reflink, then (if allow_hardlink) a hardlink on
+        the same device, then falls back to a full copy. Metadata (mtime) is preserved like copy2.
+        dst is always created exclusively, so an existing file (possibly a
+        hardlink to src) is never truncated or replaced.
+        
+        Returns:
+            Method used: "reflink", "hardlink" or "copy"
+        
+        Raises:
+            FileExistsError: If dst already exists
+        """
+        if fcntl is not None:
+            with open(src, "rb") as src_f, open(dst, "xb") as dst_f:
+                try:
+                    fcntl.ioctl(dst_f.fileno(), FICLONE, src_f.fileno())
+                    cloned = True
+                except OSError:
+                    cloned = False
+            if cloned:
+                shutil.copystat(src, dst)
+                return "reflink"
+            # Only ever removes the empty file this call just created
+            dst.unlink()
+        
+        if self.config.get("allow_hardlink", False) and src.stat().st_dev == dst.parent.stat().st_dev:
+            try:
+                os.link(src, dst)
+                return "hardlink"
+            except FileExistsError:
+                raise
+            except OSError:
+                pass
+        
+        with open(src, "rb") as src_f, open(dst, "xb") as dst_f:
+            shutil.copyfileobj(src_f, dst_f, length=1 << 20)
+        shutil.copystat(src, dst)
+        return "copy"
+    
+    def _scan_backups(self, backup_dir: Path) -> List[Tuple[str, str, os.stat_result]]:
+        """Read the backup directory once; returns (name, path, stat) per file."""
+        with os.scandir(backup_dir) as it:
+            return [(e.name, e.path, e.stat()) for e in it if e.is_file()]
+    
+    def _cleanup_old_backups(self, backup_dir: Path, entries: Optional[List[Tuple[str, str, os.stat_result]]] = None) -> int:
+        """
+        Remove backups older than retention period.
+        
+        If a prefetched `entries` list is given, removed backups are dropped from it.
+        """
         retention_days = self.config.get("retention_days", 7)
-        cutoff_date = datetime.now() - timedelta(days=retention_days)
+        cutoff = (datetime.now() - timedelta(days=retention_days)).timestamp()
+        
+        if entries is None:
+            entries = self._scan_backups(backup_dir)
         
         cleaned_count = 0
+        kept = []
         
-        for backup_file in backup_dir.iterdir():
-            if not backup_file.is_file():
-                continue
-            
+        for name, path, stat in entries:
             # Check file modification time
-            mtime = datetime.fromtimestamp(backup_file.stat().st_mtime)
-            
-            if mtime < cutoff_date:
+            if stat.st_mtime < cutoff:
                 try:
-                    backup_file.unlink()
+                    os.unlink(path)
                     cleaned_count += 1
-                    self.logger.debug(f"Removed old backup: {backup_file.name}")
+                    self.logger.debug(f"Removed old backup: {name}")
+                    continue
                 except Exception as e:
-                    self.logger.warning(f"Could not remove {backup_file.name}: {e}")
+                    self.logger.warning(f"Could not remove {name}: {e}")
+            kept.append((name, path, stat))
         
+        entries[:] = kept
         return cleaned_count
     
-    def _list_backups(self, backup_dir: Path) -> List[Dict[str, Any]]:
+    def _list_backups(self, backup_dir: Path, entries: Optional[List[Tuple[str, str, os.stat_result]]] = None) -> List[Dict[str, Any]]:
         """List all backups with metadata."""
-        backups = []
-        
-        for backup_file in sorted(backup_dir.iterdir()):
-            if not backup_file.is_file():
-                continue
-            
-            stat = backup_file.stat()
-            backups.append({
-                "path": str(backup_file),
-                "name": backup_file.name,
+        if entries is None:
+            entries = self._scan_backups(backup_dir)
+        
+        return [
+            {
+                "path": path,
+                "name": name,
                 "size_bytes": stat.st_size,
                 "created": datetime.fromtimestamp(stat.st_mtime).isoformat()
-            })
-        
-        return backups
+            }
+            for name, path, stat in sorted(entries)
+        ]
     
     def _stub_cloud_upload(self, file_path: Path) -> str:
         """Stub for Google Drive upload."""
@@ -98,6 +176,7 @@ class BackupManagerAgent(BaseAgent):
             {
                 "backup_path": str - Path to backup file (or None if disabled),
                 "backup_enabled": bool - Whether backup was created,
+                "backup_method": str - reflink, hardlink or copy,
                 "cleaned_count": int - Number of old backups removed,
                 "total_backups": int - Current backup count,
                 "cloud_upload": str - Status of cloud upload
@@ -118,18 +197,28 @@ class BackupManagerAgent(BaseAgent):
         
         backup_dir = self._get_backup_dir(output_dir)
         
-        # Create backup
-        backup_name = self._generate_backup_name(input_path)
-        backup_path = backup_dir / backup_name
-        
-        self.logger.info(f"Creating backup: {backup_name}")
-        shutil.copy2(input_path, backup_path)
+        # Create backup; another agent may have taken the name in the same second
+        for _ in range(self.MAX_NAME_ATTEMPTS):
+            backup_name = self._generate_backup_name(input_path)
+            backup_path = backup_dir / backup_name
+            self.logger.info(f"Creating backup: {backup_name}")
+            try:
+                backup_method = self._fast_copy(input_path, backup_path)
+                break
+            except FileExistsError:
+                self.logger.debug(f"Backup name taken, retrying: {backup_name}")
+        else:
+            raise RuntimeError(f"Could not find a free backup name for {input_path.name} in {backup_dir}")
+        self.logger.debug(f"Backup created via {backup_method}")
         
         if not backup_path.exists():
             raise RuntimeError(f"Failed to create backup: {backup_path}")
         
+        # Single directory scan shared by cleanup and listing
+        entries = self._scan_backups(backup_dir)
+        
         # Cleanup old backups
-        cleaned_count = self._cleanup_old_backups(backup_dir)
+        cleaned_count = self._cleanup_old_backups(backup_dir, entries)
         if cleaned_count > 0:
             self.logger.info(f"Cleaned {cleaned_count} old backup(s)")
         
@@ -139,13 +228,14 @@ class BackupManagerAgent(BaseAgent):
             cloud_status = self._stub_cloud_upload(backup_path)
         
         # Count total backups
-        total_backups = len(self._list_backups(backup_dir))
+        total_backups = len(self._list_backups(backup_dir, entries))
         
         self.logger.info(f"Backup created successfully")
         
         return {
             "backup_path": str(backup_path),
             "backup_enabled": True,
+            "backup_method": backup_method,
             "cleaned_count": cleaned_count,
             "total_backups": total_backups,
             "cloud_upload": cloud_status
@@ -4,9 +4,13 @@ Base Agent - Abstract interface for all pipeline agents.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Dict, Any, Optional, List, Callable, Union
 from pathlib import Path
 import logging
+import os
+import subprocess
+import threading
 import time
 
 
@@ -51,7 +55,7 @@ class BaseAgent(ABC):
         return end - self._start_time
     
     @abstractmethod
-    def _execute(self, input_path: Path, output_dir: Path) -> Dict[str, Any]:
+    def _execute(self, input_path: Path, output_dir: Path, **options: Any) -> Dict[str, Any]:
         """
         Execute the agent's core logic.
         
@@ -60,13 +64,14 @@ class BaseAgent(ABC):
         Args:
             input_path: Path to input file
             output_dir: Directory for output files
+            **options: Per-call inputs the agent accepts (see subclass)
             
         Returns:
             Dict with agent-specific results
         """
         pass
     
-    def process(self, input_path: str, output_dir: str) -> Dict[str, Any]:
+    def process(self, input_path: Union[str, Path], output_dir: Union[str, Path], **options: Any) -> Dict[str, Any]:
         """
         Process input and return results.
         
@@ -75,6 +80,8 @@ class BaseAgent(ABC):
         Args:
             input_path: Path to input file
             output_dir: Directory for output files
+            **options: Per-call inputs forwarded to _execute(), so callers
+                don't have to mutate the shared agent config
             
         Returns:
             {
@@ -85,17 +92,19 @@ class BaseAgent(ABC):
                 **agent_specific_results
             }
         """
-        input_path = Path(input_path)
-        output_dir = Path(output_dir)
+        if not isinstance(input_path, Path):
+            input_path = Path(input_path)
+        if not isinstance(output_dir, Path):
+            output_dir = Path(output_dir)
         
-        # Ensure output directory exists
+        # Ensure output directory exists; may have been removed since the last run
         output_dir.mkdir(parents=True, exist_ok=True)
         
         self.logger.info(f"Starting {self.name}")
         self._start_time = time.time()
         
         try:
-            result = self._execute(input_path, output_dir)
+            result = self._execute(input_path, output_dir, **options)
             self._end_time = time.time()
             
             return {
@@ -118,6 +127,118 @@ class BaseAgent(ABC):
                 "error": error_msg
             }
     
+    def _run_capped(
+        self,
+        cmd: List[str],
+        timeout: float,
+        tail_lines: int = 256,
+        text: bool = True
+    ) -> subprocess.CompletedProcess:
+        """
+        Run a command keeping only the last `tail_lines` lines of stderr in memory.
+        
+        FFmpeg can print megabytes of stderr on long files, but everything we parse
+        (stats summaries, error messages) is at the end.
+        
+        Returns:
+            CompletedProcess with the stderr tail as text, or bytes if text=False
+            (stdout is discarded)
+        """
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            text=text, errors="replace" if text else None
+        )
+        tail = deque(maxlen=tail_lines)
+        reader = threading.Thread(target=tail.extend, args=(proc.stderr,), daemon=True)
+        reader.start()
+        
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            reader.join()
+        
+        stderr = "".join(tail) if text else b"".join(tail)
+        return subprocess.CompletedProcess(cmd, proc.returncode, None, stderr)
+    
+    def _run_ffmpeg(
+        self,
+        cmd: List[str],
+        on_progress: Optional[Callable[[int], None]] = None,
+        stall_timeout: float = 60.0,
+        tail_lines: int = 256
+    ) -> subprocess.CompletedProcess:
+        """
+        Run an FFmpeg command with structured progress reporting.
+        
+        Adds `-progress pipe:1 -nostats` and parses the key=value lines FFmpeg
+        writes to stdout. Instead of a hard wall-clock cap, the run is killed
+        when no progress is reported for `stall_timeout` seconds.
+        
+        Args:
+            cmd: FFmpeg argv (starting with "ffmpeg")
+            on_progress: Called with the output position in milliseconds
+            stall_timeout: Seconds without progress before the run is killed
+            tail_lines: Lines of stderr to keep for error reporting
+            
+        Returns:
+            CompletedProcess with the stderr tail as text (stdout is consumed)
+        """
+        cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, errors="replace"
+        )
+        tail = deque(maxlen=tail_lines)
+        last_progress = [time.monotonic()]
+        
+        def read_progress():
+            for line in proc.stdout:
+                key, _, value = line.strip().partition("=")
+                # out_time_ms is reported in microseconds despite its name
+                if key == "out_time_ms" and value.isdigit():
+                    last_progress[0] = time.monotonic()
+                    if on_progress:
+                        on_progress(int(value) // 1000)
+        
+        readers = [
+            threading.Thread(target=tail.extend, args=(proc.stderr,), daemon=True),
+            threading.Thread(target=read_progress, daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        
+        try:
+            while True:
+                try:
+                    proc.wait(timeout=1.0)
+                    break
+                except subprocess.TimeoutExpired:
+                    if time.monotonic() - last_progress[0] > stall_timeout:
+                        proc.kill()
+                        proc.wait()
+                        raise RuntimeError(f"FFmpeg stalled: no progress for {stall_timeout:.0f}s")
+        finally:
+            for reader in readers:
+                reader.join()
+        
+        return subprocess.CompletedProcess(cmd, proc.returncode, None, "".join(tail))
+    
+    @staticmethod
+    def _filter_thread_args() -> List[str]:
+        """FFmpeg global options running filter graphs on every core (default is 1 thread)."""
+        threads = str(os.cpu_count() or 1)
+        return ["-filter_threads", threads, "-filter_complex_threads", threads]
+    
+    @staticmethod
+    def _escape_filter_path(path: Union[str, Path]) -> str:
+        """Escape a file path for use inside an FFmpeg filter argument."""
+        # Windows backslashes and drive colons break filtergraph parsing
+        return str(path).replace("\\", "/").replace(":", "\\:")
+    
     def validate_input(self, input_path: Path) -> bool:
         """Check if input file exists and is readable."""
         if not input_path.exists():
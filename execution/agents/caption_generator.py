@@ -5,14 +5,48 @@ Caption Generator Agent - Transcribes audio and generates SRT subtitles.
 Uses OpenAI Whisper for speech-to-text with word-level timestamps.
 """
 
+import hashlib
+import io
+import json
+import logging
+import os
 import subprocess
+import wave
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
-import tempfile
+from typing import Dict, Any, List, Tuple, Optional
 
 from .base_agent import BaseAgent
 
 
+# Loaded Whisper models keyed by (backend, model, device); loading weights costs seconds per call
+_WHISPER_MODEL_CACHE: Dict[Tuple[str, str, Optional[str]], Any] = {}
+
+# Transcriptions persisted across runs, keyed by audio content + transcription settings
+TRANSCRIPTION_CACHE_DIR = Path.home() / ".cache" / "prod-bench" / "whisper"
+
+# Whisper expects 16 kHz mono; audio is piped from ffmpeg as raw 16-bit PCM
+SAMPLE_RATE = 16000
+
+# SRT entries buffered per write
+SRT_WRITE_BATCH = 1000
+
+
+def _pcm_to_float32(pcm: bytes):
+    """Convert s16le PCM bytes to the float32 array in [-1, 1) Whisper transcribes."""
+    import numpy as np
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+def _import_faster_whisper():
+    """Return (ctranslate2, faster_whisper.WhisperModel), or raise RuntimeError if not installed."""
+    try:
+        import ctranslate2
+        from faster_whisper import WhisperModel
+    except ImportError:
+        raise RuntimeError("faster-whisper package not installed. Run 'pip install faster-whisper'")
+    return ctranslate2, WhisperModel
+
+
 class CaptionGeneratorAgent(BaseAgent):
     """
     Generates SRT captions using Whisper transcription.
@@ -22,43 +56,148 @@ class CaptionGeneratorAgent(BaseAgent):
         language: ISO 639-1 language code 
         max_words_per_line: Maximum words per subtitle line
         max_chars_per_line: Maximum characters per line
-        burn_captions: Burn captions into video (default: False)
+        burn_captions: Burn captions into video (default: False). The pipeline
+            orchestrator renders them in the VideoEnhancerAgent encode instead.
         font_size: Font size for burned captions (default: 24)
         font_color: Font color for burned captions (default: 'white')
+        device: Device for local Whisper, e.g. "cpu", "cuda", "cuda:1" (default: auto)
+        backend: Local Whisper backend, "openai" (reference PyTorch) or
+            "faster-whisper" (CTranslate2, several times faster) (default: openai)
+        beam_size: Beam search width for local Whisper (default: greedy for
+            openai, 2 for faster-whisper)
+        quantization: faster-whisper compute type, e.g. int8, int8_float16,
+            float16 (default: int8_float16 on CUDA, int8 on CPU)
+        model_path: Local CTranslate2 model directory for faster-whisper,
+            used instead of whisper_model. Pre-quantize once with
+            `ct2-transformers-converter --model openai/whisper-base
+            --output_dir models/whisper-base-int8 --quantization int8`
+        transcription_cache: Reuse transcriptions of identical audio (default: True)
+        transcription_cache_dir: Cache location (default: ~/.cache/prod-bench/whisper)
     """
     
-    def _extract_audio(self, video_path: Path, audio_path: Path) -> None:
-        """Extract audio from video for Whisper processing."""
+    # OpenAI clients keyed by API key, reused across calls for their HTTP pool
+    _openai_clients: Dict[str, Any] = {}
+    
+    def __init__(self, config: Dict[str, Any], logger: Optional[logging.Logger] = None):
+        super().__init__(config, logger)
+        # Line limits are read once; _segment_to_srt_lines runs per segment
+        self._max_words: int = self.config.get("max_words_per_line", 10)
+        self._max_chars: int = self.config.get("max_chars_per_line", 42)
+        # Resolved device per (backend, configured device); the CUDA query runs once
+        self._resolved_devices: Dict[Tuple[str, Optional[str]], Tuple[str, int]] = {}
+    
+    def _extract_audio(self, video_path: Path) -> bytes:
+        """Extract audio from video for Whisper processing (raw PCM via pipe, no temp file)."""
         cmd = [
-            "ffmpeg", "-y", "-hide_banner",
+            "ffmpeg", "-hide_banner",
             "-i", str(video_path),
             "-vn",
-            "-ar", "16000",  # Whisper expects 16kHz
+            "-ar", str(SAMPLE_RATE),  # Whisper expects 16kHz
             "-ac", "1",  # Mono
-            "-c:a", "pcm_s16le",
+            "-threads", "2",  # Resampling to 16 kHz mono needs little; leave cores for other phases
+            "-f", "s16le",
             "-loglevel", "error",
-            str(audio_path)
+            "pipe:1"
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        result = subprocess.run(cmd, capture_output=True, timeout=120)
         if result.returncode != 0:
-            raise RuntimeError(f"Audio extraction failed: {result.stderr}")
+            raise RuntimeError(f"Audio extraction failed: {result.stderr.decode('utf-8', errors='replace')}")
+        return result.stdout
     
 
-    def _transcribe(self, audio_path: Path) -> List[Dict[str, Any]]:
-        """Transcribe audio using Whisper (Local or API)."""
+    def _transcription_cache_key(self, audio: bytes) -> str:
+        """BLAKE2b of the extracted audio plus every setting that changes the transcript."""
+        digest = hashlib.blake2b(audio, digest_size=16)
+        
+        cfg = self.config
+        use_api = cfg.get("use_api", False)
+        settings = (
+            "api" if use_api else cfg.get("backend", "openai"),
+            # CUDA decodes in fp16/int8_float16, CPU in fp32/int8, so transcripts differ
+            None if use_api else list(self._resolve_device()),
+            cfg.get("whisper_model", "base"),
+            cfg.get("language", "en"),
+            cfg.get("beam_size"),
+            cfg.get("quantization"),
+            cfg.get("model_path"),
+        )
+        digest.update(json.dumps(settings).encode("utf-8"))
+        return digest.hexdigest()
+    
+    def _resolve_device(self) -> Tuple[str, int]:
+        """
+        (device type, device index) the local Whisper backend runs on.
+        
+        The configured device ("cpu", "cuda", "cuda:1") is split so
+        faster-whisper, which rejects "cuda:N", gets the index separately.
+        Unset, it is CUDA when available. Resolved once per (backend, device)
+        setting, so cache-key lookups don't import torch/ctranslate2 or
+        query CUDA on every call.
+        """
+        backend = self.config.get("backend", "openai")
+        configured = self.config.get("device")
+        key = (backend, configured)
+        resolved = self._resolved_devices.get(key)
+        if resolved is None:
+            device, _, index = (configured or self._default_device(backend)).partition(":")
+            resolved = self._resolved_devices[key] = (device, int(index or 0))
+        return resolved
+    
+    @staticmethod
+    def _default_device(backend: str) -> str:
+        """CUDA if the backend can see a GPU, else CPU."""
+        if backend == "faster-whisper":
+            ctranslate2, _ = _import_faster_whisper()
+            return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        
+        import torch
+        # Same default whisper.load_model would pick
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    
+    def _transcribe_cached(self, audio: bytes) -> List[Dict[str, Any]]:
+        """Transcribe, reusing a previous result for the same audio and settings."""
+        if not self.config.get("transcription_cache", True):
+            return self._transcribe(audio)
+        
+        cache_dir = Path(self.config.get("transcription_cache_dir", TRANSCRIPTION_CACHE_DIR))
+        cache_path = cache_dir / f"{self._transcription_cache_key(audio)}.json"
+        
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                segments = json.load(f)
+            self.logger.info(f"Using cached transcription: {cache_path.name}")
+            return segments
+        except (OSError, ValueError):
+            pass
+        
+        segments = self._transcribe(audio)
+        
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            data = json.dumps(segments, separators=(",", ":"))
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError) as e:
+            self.logger.warning(f"Could not cache transcription: {e}")
+        
+        return segments
+
+    def _transcribe(self, audio: bytes) -> List[Dict[str, Any]]:
+        """Transcribe 16 kHz mono s16le PCM using Whisper (Local or API)."""
         use_api = self.config.get("use_api", False)
         
         if use_api:
-            return self._transcribe_api(audio_path)
+            return self._transcribe_api(audio)
         else:
-            return self._transcribe_local(audio_path)
+            return self._transcribe_local(audio)
 
-    def _transcribe_api(self, audio_path: Path) -> List[Dict[str, Any]]:
+    def _transcribe_api(self, audio: bytes) -> List[Dict[str, Any]]:
         """Transcribe using OpenAI API."""
         try:
             from openai import OpenAI
-            import os
             from dotenv import load_dotenv
             
             # Load environment variables (to ensure OPENAI_API_KEY is available)
@@ -68,78 +207,168 @@ class CaptionGeneratorAgent(BaseAgent):
             if not api_key:
                 raise ValueError("OPENAI_API_KEY not found in environment")
                 
-            client = OpenAI(api_key=api_key)
+            client = self._openai_clients.get(api_key)
+            if client is None:
+                client = self._openai_clients[api_key] = OpenAI(api_key=api_key)
             model_name = "whisper-1" # Standard API model
             
             self.logger.info(f"Transcribing via OpenAI API ({model_name})...")
             
-            with open(audio_path, "rb") as audio_file:
-                # Note: API response format for 'verbose_json' matches internal structure roughly
-                transcript = client.audio.transcriptions.create(
-                    model=model_name,
-                    file=audio_file,
-                    response_format="verbose_json",
-                    timestamp_granularities=["word"] # Request word timestamps
-                )
-            
-            # Convert API response object to dictionary format expected by segment logic
-            api_segments = transcript.segments
-            api_words = transcript.words
+            # The API needs a container; wrap the PCM in an in-memory WAV
+            wav_buffer = io.BytesIO()
+            with wave.open(wav_buffer, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(SAMPLE_RATE)
+                wav.writeframes(audio)
             
-            normalized_segments = []
+            # Note: API response format for 'verbose_json' matches internal structure roughly
+            transcript = client.audio.transcriptions.create(
+                model=model_name,
+                file=("audio.wav", wav_buffer.getvalue()),
+                response_format="verbose_json",
+                timestamp_granularities=["segment", "word"] # Segments are omitted unless requested alongside words
+            )
             
-            # Pool of all words (convert from Pydantic models if needed)
-            words_pool = [w.model_dump() for w in api_words] if hasattr(api_words[0], 'model_dump') else api_words
-            
-            for seg in api_segments:
-                seg_dict = seg.model_dump() if hasattr(seg, 'model_dump') else seg
-                
-                # Filter words that belong to this segment
-                seg_start = seg_dict['start']
-                seg_end = seg_dict['end']
-                
-                # Assign words to segment if not present or empty
-                if 'words' not in seg_dict or not seg_dict['words']:
-                    seg_dict['words'] = [
-                        w for w in words_pool 
-                        if w['start'] >= seg_start and w['end'] <= seg_end
-                    ]
-                
-                normalized_segments.append(seg_dict)
-                
-            return normalized_segments
+            # Convert API response object to dictionary format expected by segment logic
+            return self._bucket_api_words(transcript.segments or [], transcript.words or [])
 
         except ImportError:
             raise RuntimeError("openai or python-dotenv package not installed. Run 'pip install openai python-dotenv'")
         except Exception as e:
             raise RuntimeError(f"OpenAI API Transcription failed: {e}")
 
-    def _transcribe_local(self, audio_path: Path) -> List[Dict[str, Any]]:
-        """Transcribe using local Whisper library."""
+    @staticmethod
+    def _bucket_api_words(api_segments: List[Any], api_words: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Attach API word timestamps to their segments in one linear pass.
+        
+        Both lists come back sorted by start time; each word goes to the
+        segment it starts in. Fields are read directly rather than via model_dump().
+        """
+        def field(obj, name):
+            return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+        
+        normalized_segments = [
+            {
+                "start": field(seg, "start"),
+                "end": field(seg, "end"),
+                "text": field(seg, "text"),
+                "words": []
+            }
+            for seg in api_segments
+        ]
+        if not normalized_segments:
+            return normalized_segments
+        
+        last = len(normalized_segments) - 1
+        idx = 0
+        for w in api_words:
+            start = field(w, "start")
+            while idx < last and start >= normalized_segments[idx]["end"]:
+                idx += 1
+            normalized_segments[idx]["words"].append(
+                {"start": start, "end": field(w, "end"), "word": field(w, "word")}
+            )
+        
+        return normalized_segments
+
+    def _transcribe_local(self, audio: bytes) -> List[Dict[str, Any]]:
+        """Transcribe using the configured local Whisper backend."""
+        backend = self.config.get("backend", "openai")
+        
+        if backend == "faster-whisper":
+            return self._transcribe_faster_whisper(audio)
+        if backend != "openai":
+            raise ValueError(f"Unknown Whisper backend: {backend}")
+        
+        return self._transcribe_openai_whisper(audio)
+
+    def _transcribe_openai_whisper(self, audio: bytes) -> List[Dict[str, Any]]:
+        """Transcribe using the reference Whisper library (fp16 inference on CUDA)."""
+        import torch
         import whisper
         
         model_name = self.config.get("whisper_model", "base")
         language = self.config.get("language", "en")
+        device, index = self._resolve_device()
+        use_fp16 = device == "cuda"
+        # Torch takes the index in the device string
+        torch_device = f"cuda:{index}" if use_fp16 else device
+        
+        key = ("openai", model_name, torch_device)
+        model = _WHISPER_MODEL_CACHE.get(key)
+        if model is None:
+            self.logger.info(f"Loading Whisper model (Local): {model_name}")
+            model = whisper.load_model(model_name, device=torch_device)
+            if use_fp16:
+                # Half the weight bandwidth; LayerNorm stays fp32 for stability
+                model.half()
+                for module in model.modules():
+                    if isinstance(module, whisper.model.LayerNorm):
+                        module.float()
+            _WHISPER_MODEL_CACHE[key] = model
         
-        self.logger.info(f"Loading Whisper model (Local): {model_name}")
-        model = whisper.load_model(model_name)
+        options = {"language": language, "word_timestamps": True, "fp16": use_fp16}
+        # Whisper's Python API decodes greedily unless a beam size is given
+        beam_size = self.config.get("beam_size")
+        if beam_size:
+            options["beam_size"] = beam_size
         
         self.logger.info("Transcribing audio (Local)...")
-        result = model.transcribe(
-            str(audio_path),
+        with torch.no_grad():
+            result = model.transcribe(_pcm_to_float32(audio), **options)
+        
+        return result.get("segments", [])
+
+    def _transcribe_faster_whisper(self, audio: bytes) -> List[Dict[str, Any]]:
+        """Transcribe using faster-whisper (CTranslate2, int8 weights by default)."""
+        _, WhisperModel = _import_faster_whisper()
+        
+        model_name = self.config.get("model_path") or self.config.get("whisper_model", "base")
+        language = self.config.get("language", "en")
+        device, index = self._resolve_device()
+        # int8 weights halve memory bandwidth; on GPU activations stay fp16
+        compute_type = self.config.get("quantization") or ("int8_float16" if device == "cuda" else "int8")
+        
+        key = ("faster-whisper", f"{model_name}:{compute_type}", f"{device}:{index}")
+        model = _WHISPER_MODEL_CACHE.get(key)
+        if model is None:
+            self.logger.info(f"Loading faster-whisper model (Local): {model_name} ({compute_type})")
+            model = _WHISPER_MODEL_CACHE[key] = WhisperModel(
+                model_name, device=device, device_index=index, compute_type=compute_type
+            )
+        
+        self.logger.info("Transcribing audio (faster-whisper)...")
+        segments, _info = model.transcribe(
+            _pcm_to_float32(audio),
             language=language,
-            word_timestamps=True
+            word_timestamps=True,
+            beam_size=self.config.get("beam_size", 2),
+            vad_filter=True
         )
         
-        return result.get("segments", [])
+        # Same dict shape as the reference Whisper segments
+        return [
+            {
+                "start": seg.start,
+                "end": seg.end,
+                "text": seg.text,
+                "words": [
+                    {"start": w.start, "end": w.end, "word": w.word}
+                    for w in (seg.words or [])
+                ]
+            }
+            for seg in segments
+        ]
 
     
     def _format_timestamp(self, seconds: float) -> str:
         """Convert seconds to SRT timestamp format (HH:MM:SS,mmm)."""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds % 1) * 1000)
+        # Integer math on total milliseconds; rounding avoids 1.001 -> 1,000
+        hours, rem = divmod(round(seconds * 1000), 3_600_000)
+        minutes, rem = divmod(rem, 60_000)
+        secs, millis = divmod(rem, 1000)
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
     
     def _segment_to_srt_lines(self, segment: Dict[str, Any]) -> List[Tuple[float, float, str]]:
@@ -148,8 +377,8 @@ class CaptionGeneratorAgent(BaseAgent):
         
         Returns list of (start, end, text) tuples.
         """
-        max_words = self.config.get("max_words_per_line", 10)
-        max_chars = self.config.get("max_chars_per_line", 42)
+        max_words = self._max_words
+        max_chars = self._max_chars
         
         words = segment.get("words", [])
         if not words:
@@ -158,6 +387,7 @@ class CaptionGeneratorAgent(BaseAgent):
         
         lines = []
         current_words = []
+        current_len = 0  # len(" ".join(current_words)), kept as a running total
         current_start = None
         current_end = None
         
@@ -169,15 +399,15 @@ class CaptionGeneratorAgent(BaseAgent):
             if current_start is None:
                 current_start = word_info["start"]
             
+            current_len += len(word) + (1 if current_words else 0)
             current_words.append(word)
             current_end = word_info["end"]
             
-            current_text = " ".join(current_words)
-            
             # Check if we should start a new line
-            if len(current_words) >= max_words or len(current_text) >= max_chars:
-                lines.append((current_start, current_end, current_text))
+            if len(current_words) >= max_words or current_len >= max_chars:
+                lines.append((current_start, current_end, " ".join(current_words)))
                 current_words = []
+                current_len = 0
                 current_start = None
                 current_end = None
         
@@ -188,26 +418,30 @@ class CaptionGeneratorAgent(BaseAgent):
         return lines
     
     def _generate_srt(self, segments: List[Dict[str, Any]], output_path: Path) -> Dict[str, Any]:
-        """Generate SRT file from transcription segments."""
-        srt_entries = []
+        """Generate SRT file from transcription segments (streamed, no intermediate entry list)."""
+        ts = self._format_timestamp
+        idx = 0
         word_count = 0
+        duration = 0
+        buf: List[str] = []
         
-        for segment in segments:
-            lines = self._segment_to_srt_lines(segment)
-            srt_entries.extend(lines)
-            word_count += len(segment.get("text", "").split())
-        
-        # Write SRT file
         with open(output_path, "w", encoding="utf-8") as f:
-            for i, (start, end, text) in enumerate(srt_entries, 1):
-                f.write(f"{i}\n")
-                f.write(f"{self._format_timestamp(start)} --> {self._format_timestamp(end)}\n")
-                f.write(f"{text}\n\n")
-        
-        duration = srt_entries[-1][1] if srt_entries else 0
+            for segment in segments:
+                for start, end, text in self._segment_to_srt_lines(segment):
+                    idx += 1
+                    buf.append(f"{idx}\n{ts(start)} --> {ts(end)}\n{text}\n\n")
+                    duration = end
+                word_count += len(segment.get("text", "").split())
+                
+                # Batch writes while keeping the buffer bounded
+                if len(buf) >= SRT_WRITE_BATCH:
+                    f.write("".join(buf))
+                    buf.clear()
+            
+            f.write("".join(buf))
         
         return {
-            "entry_count": len(srt_entries),
+            "entry_count": idx,
             "word_count": word_count,
             "duration": duration
         }
@@ -215,8 +449,7 @@ class CaptionGeneratorAgent(BaseAgent):
     def _burn_captions(self, video_path: str, srt_path: str, output_path: str):
         """Burn captions into video using FFmpeg."""
         # Note: formatting srt path for ffmpeg filter requires escaping
-        # simple replacement for Windows path backslashes often needed
-        srt_path_escaped = srt_path.replace("\\", "/").replace(":", "\\:")
+        srt_path_escaped = self._escape_filter_path(srt_path)
         
         font_size = self.config.get('font_size', 24)
         font_color = self.config.get('font_color', '&HFFFFFF&')
@@ -242,37 +475,28 @@ class CaptionGeneratorAgent(BaseAgent):
         
         output_path = output_dir / f"{input_path.stem}_captions.srt"
         
-        # Extract audio to temp file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            audio_path = Path(tmp.name)
+        # Extract audio straight into memory
+        self.logger.info(f"Extracting audio from {input_path.name}")
+        audio = self._extract_audio(input_path)
         
-        try:
-            self.logger.info(f"Extracting audio from {input_path.name}")
-            self._extract_audio(input_path, audio_path)
-            
-            # Transcribe
-            segments = self._transcribe(audio_path)
-            
-            # Generate SRT
-            self.logger.info(f"Generating SRT file: {output_path.name}")
-            stats = self._generate_srt(segments, output_path)
-            
-            result = {
-                "srt_path": str(output_path),
-                **stats
-            }
-            
-            # Burn captions if requested
-            if self.config.get("burn_captions"):
-                 burned_video_path = output_dir / f"{input_path.stem}_burned.mp4"
-                 self.logger.info(f"Burning captions into video: {burned_video_path.name}")
-                 self._burn_captions(str(input_path), str(output_path), str(burned_video_path))
-                 result["burned_video_path"] = str(burned_video_path)
-            
-        finally:
-            # Cleanup temp audio
-            if audio_path.exists():
-                audio_path.unlink()
+        # Transcribe (or reuse a cached transcript of the same audio)
+        segments = self._transcribe_cached(audio)
+        
+        # Generate SRT
+        self.logger.info(f"Generating SRT file: {output_path.name}")
+        stats = self._generate_srt(segments, output_path)
+        
+        result = {
+            "srt_path": str(output_path),
+            **stats
+        }
+        
+        # Burn captions if requested
+        if self.config.get("burn_captions"):
+             burned_video_path = output_dir / f"{input_path.stem}_burned.mp4"
+             self.logger.info(f"Burning captions into video: {burned_video_path.name}")
+             self._burn_captions(str(input_path), str(output_path), str(burned_video_path))
+             result["burned_video_path"] = str(burned_video_path)
         
         if not output_path.exists():
             raise RuntimeError("SRT file was not created")
@@ -6,16 +6,26 @@ Features:
 - Even keyframe extraction across video duration
 - Configurable count, dimensions, and quality
 - JPEG/PNG/WebP output formats
-- Scoring Stub
+- Sharpness scoring (Laplacian variance, needs opencv-python)
 """
 
+import logging
+import math
+import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 from .base_agent import BaseAgent
 
 
+# Laplacian variance treated as "perfectly sharp" when normalizing scores to 0-1
+SHARPNESS_SCALE = 2000.0
+# Frames are scored on a downscaled copy; sharpness ranking survives the resize
+SCORE_WIDTH = 320
+
+
 class ThumbnailGeneratorAgent(BaseAgent):
     """
     Generates thumbnails at even intervals across video.
@@ -28,13 +38,27 @@ class ThumbnailGeneratorAgent(BaseAgent):
         quality: JPEG/WebP quality 1-100 (default: 95)
         strategy: Extraction strategy (default: even_keyframes)
         detect_faces: Stub for face detection
+        single_pass_max_duration: Longest video (seconds) extracted in one
+            decode pass; longer videos seek per thumbnail (default: 300)
+        contact_sheet: Also write a grid of all thumbnails (default: False)
     """
     
-    def _get_video_duration(self, video_path: Path) -> float:
-        """Get video duration in seconds."""
+    def __init__(self, config: Dict[str, Any], logger: Optional[logging.Logger] = None):
+        super().__init__(config, logger)
+        # Missing OpenCV is reported once per agent, not once per thumbnail
+        self._warned_no_cv2 = False
+    
+    def _probe_video(self, video_path: Path) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """
+        Get video duration in seconds and frame size with one ffprobe call.
+        
+        Returns:
+            (duration, (width, height)); size is None if there is no video stream
+        """
         cmd = [
             "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=width,height:format=duration",
             "-of", "default=noprint_wrappers=1:nokey=1",
             str(video_path)
         ]
@@ -43,7 +67,10 @@ class ThumbnailGeneratorAgent(BaseAgent):
         if result.returncode != 0:
             raise RuntimeError(f"Could not get video duration: {result.stderr}")
         
-        return float(result.stdout.strip())
+        # Stream entries print before the format section: width, height, duration
+        values = result.stdout.split()
+        size = (int(values[0]), int(values[1])) if len(values) >= 3 else None
+        return float(values[-1]), size
     
     def _calculate_timestamps(self, duration: float, count: int) -> List[float]:
         """Calculate evenly-spaced timestamps for thumbnail extraction."""
@@ -90,13 +117,25 @@ class ThumbnailGeneratorAgent(BaseAgent):
         
         return []
     
+    def _scale_filter(self, width: int, height: int, src_size: Optional[Tuple[int, int]] = None) -> str:
+        """
+        Fit frame into width x height, letterboxing the remainder.
+        
+        The pad is skipped when src_size already has the target aspect ratio.
+        """
+        scale = f"scale={width}:{height}:force_original_aspect_ratio=decrease"
+        if src_size and abs(src_size[0] * height - src_size[1] * width) <= 0.01 * src_size[1] * width:
+            return scale
+        return f"{scale},pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"
+    
     def _extract_thumbnail(
         self, 
         video_path: Path, 
         timestamp: float, 
         output_path: Path,
         width: int,
-        height: int
+        height: int,
+        src_size: Optional[Tuple[int, int]] = None
     ) -> bool:
         """Extract a single thumbnail at the given timestamp."""
         quality_args = self._get_quality_args()
@@ -106,8 +145,7 @@ class ThumbnailGeneratorAgent(BaseAgent):
             "-ss", str(timestamp),
             "-i", str(video_path),
             "-vframes", "1",
-            "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
-                   f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+            "-vf", self._scale_filter(width, height, src_size),
             *quality_args,
             "-loglevel", "error",
             str(output_path)
@@ -115,16 +153,144 @@ class ThumbnailGeneratorAgent(BaseAgent):
         
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
         return result.returncode == 0 and output_path.exists()
+    
+    def _tile_layout(self, count: int) -> str:
+        """Near-square grid for count frames, wider than tall (6 -> 3x2)."""
+        cols = math.ceil(math.sqrt(count))
+        rows = math.ceil(count / cols)
+        return f"{cols}x{rows}"
+    
+    def _extract_thumbnails_single_pass(
+        self,
+        video_path: Path,
+        timestamps: List[float],
+        thumb_dir: Path,
+        ext: str,
+        width: int,
+        height: int,
+        src_size: Optional[Tuple[int, int]] = None,
+        contact_sheet_path: Optional[Path] = None
+    ) -> Optional[List[Path]]:
+        """
+        Extract all thumbnails with one FFmpeg decode pass.
+        
+        The select filter keeps the first frame at or after each timestamp,
+        so one process and one decoder init serve every thumbnail. With
+        contact_sheet_path the selected frames are also split into a tile
+        filter, writing the grid as a second output of the same pass.
+        
+        Returns:
+            Output path per timestamp (same order), or None if ffmpeg failed or
+            emitted a different number of frames. Timestamps closer together
+            than one frame select the same frame, which shifts the image
+            sequence numbering, so a short count can't be mapped back to times.
+        """
+        out_paths = [thumb_dir / f"thumb_{i:02d}{ext}" for i in range(1, len(timestamps) + 1)]
+        # Leftovers from an earlier run must not count as this run's frames
+        for path in out_paths:
+            path.unlink(missing_ok=True)
+        
+        select_expr = "+".join(f"gt({ts},prev_pts*TB)*gte(t,{ts})" for ts in timestamps)
+        frames_filter = f"select='{select_expr}',{self._scale_filter(width, height, src_size)}"
+        quality_args = self._get_quality_args()
+        thumb_pattern = str(thumb_dir / f"thumb_%02d{ext}")
+        
+        if contact_sheet_path is None:
+            cmd = [
+                "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+                *self._filter_thread_args(),
+                "-i", str(video_path),
+                "-vf", frames_filter,
+                "-fps_mode", "vfr",
+                *quality_args,
+                thumb_pattern
+            ]
+        else:
+            graph = (
+                f"[0:v]{frames_filter},split=2[thumbs][sheet];"
+                f"[sheet]tile={self._tile_layout(len(timestamps))}[grid]"
+            )
+            cmd = [
+                "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+                *self._filter_thread_args(),
+                "-i", str(video_path),
+                "-filter_complex", graph,
+                "-map", "[thumbs]", "-fps_mode", "vfr", *quality_args, thumb_pattern,
+                "-map", "[grid]", "-frames:v", "1", "-update", "1", *quality_args,
+                str(contact_sheet_path)
+            ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        if result.returncode != 0:
+            self.logger.warning(f"Single-pass thumbnail extraction failed: {result.stderr}")
+            return None
+        
+        emitted = sum(path.exists() for path in out_paths)
+        if emitted != len(timestamps):
+            self.logger.warning(
+                f"Single-pass extraction emitted {emitted} of {len(timestamps)} frames"
+            )
+            return None
+        
+        return out_paths
+
+    def _build_contact_sheet(self, thumb_paths: List[Path], contact_sheet_path: Path) -> bool:
+        """Tile already-extracted thumbnails into one grid image (decodes only the small stills)."""
+        inputs = []
+        for path in thumb_paths:
+            inputs.extend(["-i", str(path)])
+        pads = "".join(f"[{i}:v]" for i in range(len(thumb_paths)))
+        
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner",
+            *inputs,
+            "-filter_complex", f"{pads}concat=n={len(thumb_paths)}:v=1,tile={self._tile_layout(len(thumb_paths))}",
+            "-frames:v", "1", "-update", "1",
+            *self._get_quality_args(),
+            "-loglevel", "error",
+            str(contact_sheet_path)
+        ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        return result.returncode == 0 and contact_sheet_path.exists()
 
-    def _calculate_score_stub(self, image_path: Path) -> float:
-        """Stub for thumbnail scoring (e.g. contrast/face count)."""
-        # Real impl would read image with cv2/PIL
-        # For now, return randomish deterministic score
-        return 0.5 + (len(image_path.name) % 5) / 10.0
+    def _calculate_score(self, image_path: Path) -> float:
+        """
+        Score thumbnail sharpness as Laplacian variance, normalized to 0-1.
+        
+        Returns 0.0 if OpenCV is not installed or the image can't be read.
+        """
+        try:
+            import cv2
+        except ImportError:
+            if not self._warned_no_cv2:
+                self.logger.warning("opencv-python not installed; thumbnail scores will be 0.0")
+                self._warned_no_cv2 = True
+            return 0.0
+        
+        img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return 0.0
+        
+        h, w = img.shape
+        if w > SCORE_WIDTH:
+            img = cv2.resize(img, (SCORE_WIDTH, max(1, round(h * SCORE_WIDTH / w))), interpolation=cv2.INTER_AREA)
+        
+        sharpness = cv2.Laplacian(img, cv2.CV_64F).var()
+        return min(1.0, float(sharpness) / SHARPNESS_SCALE)
     
-    def _execute(self, input_path: Path, output_dir: Path) -> Dict[str, Any]:
+    def _execute(
+        self,
+        input_path: Path,
+        output_dir: Path,
+        video_duration: Optional[float] = None,
+        video_size: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
         """
         Generate thumbnails from video with scoring.
+        
+        If the caller already knows the input's video_duration (seconds) and
+        video_size ([width, height]), the ffprobe call is skipped.
         """
         self.validate_input(input_path)
         
@@ -137,23 +303,49 @@ class ThumbnailGeneratorAgent(BaseAgent):
         height = self.config.get("height", 720)
         ext = self._get_output_extension()
         
-        # Get duration and calculate timestamps
+        # Get duration/size (probing only if the caller didn't supply them) and calculate timestamps
         self.logger.info(f"Analyzing video: {input_path.name}")
-        duration = self._get_video_duration(input_path)
+        duration, src_size = video_duration, video_size
+        if not duration:
+            duration, src_size = self._probe_video(input_path)
         timestamps = self._calculate_timestamps(duration, count)
         
         self.logger.info(f"Extracting {count} thumbnails at {width}x{height}")
         
+        contact_sheet_path = thumb_dir / f"contact_sheet{ext}" if self.config.get("contact_sheet") else None
+        
+        # Short videos: one decode pass beats per-thumbnail process startup.
+        # Long videos: keyframe seeking per thumbnail avoids decoding everything.
+        out_paths = None
+        if duration <= self.config.get("single_pass_max_duration", 300):
+            out_paths = self._extract_thumbnails_single_pass(
+                input_path, timestamps, thumb_dir, ext, width, height, src_size, contact_sheet_path
+            )
+            if out_paths is None:
+                self.logger.info("Falling back to per-timestamp extraction")
+        
+        if out_paths is not None:
+            extracted = [True] * len(out_paths)
+        else:
+            # Each seek runs in its own FFmpeg process, so threads only wait on them
+            out_paths = [thumb_dir / f"thumb_{i:02d}{ext}" for i in range(1, len(timestamps) + 1)]
+            for path in [*out_paths, contact_sheet_path]:
+                if path is not None:
+                    path.unlink(missing_ok=True)
+            max_workers = max(1, min(len(timestamps), os.cpu_count() or 1))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                extracted = list(pool.map(
+                    lambda ts, out_path: self._extract_thumbnail(input_path, ts, out_path, width, height, src_size),
+                    timestamps, out_paths
+                ))
+            if contact_sheet_path is not None and any(extracted):
+                self._build_contact_sheet([p for p, ok in zip(out_paths, extracted) if ok], contact_sheet_path)
+        
         results = []
-        for i, ts in enumerate(timestamps, 1):
-            out_name = f"thumb_{i:02d}{ext}"
-            out_path = thumb_dir / out_name
-            
-            self.logger.debug(f"Extracting thumbnail {i}/{count} at {ts:.2f}s")
-            
-            if self._extract_thumbnail(input_path, ts, out_path, width, height):
+        for ts, out_path, ok in zip(timestamps, out_paths, extracted):
+            if ok:
                 # Calculate Score
-                score = self._calculate_score_stub(out_path)
+                score = self._calculate_score(out_path)
                 results.append({
                     "path": str(out_path),
                     "timestamp": round(ts, 2),
@@ -172,5 +364,6 @@ class ThumbnailGeneratorAgent(BaseAgent):
             "details": results,
             "count": len(results),
             "timestamps": timestamps,
-            "strategy": self.config.get("strategy")
+            "strategy": self.config.get("strategy"),
+            "contact_sheet_path": str(contact_sheet_path) if contact_sheet_path and contact_sheet_path.exists() else None
         }
@@ -10,6 +10,7 @@ Features:
 - Upscaling (Stub)
 """
 
+import logging
 import subprocess
 from pathlib import Path
 from typing import Dict, Any, List, Optional
@@ -18,6 +19,37 @@ import time
 from .base_agent import BaseAgent
 
 
+# Encoder name -> listed by `ffmpeg -encoders`; only definite answers are stored
+_ENCODER_CACHE: Dict[str, bool] = {}
+
+
+def _has_encoder(name: str) -> bool:
+    """
+    Check ffmpeg's encoder list for name.
+    
+    A successful listing is cached for the process lifetime. A timeout, a
+    spawn error or a failed ffmpeg run returns False without caching, so the
+    next call checks again.
+    """
+    cached = _ENCODER_CACHE.get(name)
+    if cached is not None:
+        return cached
+    
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return False
+    if result.returncode != 0:
+        return False
+    
+    available = name in result.stdout
+    _ENCODER_CACHE[name] = available
+    return available
+
+
 class VideoEnhancerAgent(BaseAgent):
     """
     Enhances video with color grading and optimized encoding.
@@ -35,53 +67,116 @@ class VideoEnhancerAgent(BaseAgent):
         saturation: Saturation adjustment (default 1.0)
         upscale: Enable upscaling (stub)
         denoise: Enable denoising (stub)
+        subtitle_path: SRT file to burn in during the encode (optional)
+        subtitle_font_size: Font size for burned subtitles (default: 24)
+        subtitle_font_color: Font color for burned subtitles (default: '&HFFFFFF&')
+        hardware_decode: Decode on the same device as the hardware encoder (default: True)
     """
     
     SUPPORTED_LUT_FORMATS = [".cube", ".3dl", ".dat", ".m3d", ".csp"]
     
+    # Hardware encoder family -> (-hwaccel backend, on-device frame format)
+    HWACCEL_BACKENDS = {
+        "videotoolbox": ("videotoolbox", "videotoolbox_vld"),
+        "nvenc": ("cuda", "cuda"),
+        "vaapi": ("vaapi", "vaapi"),
+        "qsv": ("qsv", "qsv"),
+    }
+    
+    # Encoder families that only accept on-device frames; CPU frames are uploaded
+    HWUPLOAD_FAMILIES = ("vaapi", "qsv")
+    HWUPLOAD_FILTER = "format=nv12,hwupload"
+    
+    def __init__(self, config: Dict[str, Any], logger: Optional[logging.Logger] = None):
+        super().__init__(config, logger)
+        # Set by _get_encoder_args; None means no hardware decode until then
+        self._encoder_used: Optional[str] = None
+    
     def _check_hardware_encoder(self) -> bool:
         """Check if hardware encoder is available."""
-        hw_encoder = self.config.get("hardware_encoder", "h264_videotoolbox")
-        
-        try:
-            result = subprocess.run(
-                ["ffmpeg", "-hide_banner", "-encoders"],
-                capture_output=True, text=True, timeout=5
-            )
-            return hw_encoder in result.stdout
-        except Exception:
-            return False
+        return _has_encoder(self.config.get("hardware_encoder", "h264_videotoolbox"))
     
     def _get_encoder_args(self) -> List[str]:
-        """Get FFmpeg encoder arguments based on config and availability."""
+        """
+        Get FFmpeg encoder arguments based on config and availability.
+        The chosen encoder is recorded in self._encoder_used.
+        """
         use_hw = self.config.get("hardware_acceleration", True)
         
         if use_hw and self._check_hardware_encoder():
             hw_encoder = self.config.get("hardware_encoder", "h264_videotoolbox")
             bitrate = self.config.get("hardware_bitrate", "10M")
             self.logger.info(f"Using hardware encoder: {hw_encoder}")
+            self._encoder_used = hw_encoder
             return ["-c:v", hw_encoder, "-b:v", bitrate]
         else:
             sw_encoder = self.config.get("software_encoder", "libx264")
             crf = self.config.get("crf", 18)
             self.logger.info(f"Using software encoder: {sw_encoder}")
+            self._encoder_used = sw_encoder
             return ["-c:v", sw_encoder, "-preset", "fast", "-crf", str(crf)]
     
-    def _build_video_filter(self, lut_path: Optional[Path]) -> str:
-        """Construct video filter chain (LUT + EQ + Stubbed Upscale)."""
+    def _hardware_family(self) -> Optional[str]:
+        """Family of the chosen hardware encoder ("nvenc", "vaapi", ...), or None for software."""
+        hw_encoder = self.config.get("hardware_encoder", "h264_videotoolbox")
+        if self._encoder_used != hw_encoder:
+            return None
+        family = hw_encoder.rsplit("_", 1)[-1]
+        return family if family in self.HWACCEL_BACKENDS else None
+    
+    def _needs_hwupload(self, video_filter: str) -> bool:
+        """True when a VAAPI/QSV encoder would be fed frames from system memory."""
+        if self._hardware_family() not in self.HWUPLOAD_FAMILIES:
+            return False
+        return bool(video_filter) or not self.config.get("hardware_decode", True)
+    
+    def _get_decoder_args(self, video_filter: str) -> List[str]:
+        """
+        Get FFmpeg hardware decode arguments matching the chosen encoder.
+        
+        Returns no arguments until _get_encoder_args has chosen an encoder. Frames stay on the device only when
+        there is no filter chain (LUT/EQ/subtitles run on the CPU); otherwise
+        decoded frames are downloaded once for filtering. VAAPI/QSV encoders
+        then need them uploaded again, so a named device is set up for the
+        hwupload filter _execute appends.
+        """
+        family = self._hardware_family()
+        if family is None:
+            return []
+        
+        hwaccel, output_format = self.HWACCEL_BACKENDS[family]
+        args = []
+        if self._needs_hwupload(video_filter):
+            # One device shared by the decoder and the hwupload filter
+            args = ["-init_hw_device", f"{hwaccel}=hw", "-filter_hw_device", "hw"]
+        if not self.config.get("hardware_decode", True):
+            return args
+        if video_filter:
+            return args + ["-hwaccel", hwaccel] + (["-hwaccel_device", "hw"] if args else [])
+        return ["-hwaccel", hwaccel, "-hwaccel_output_format", output_format]
+    
+    def _build_video_filter(self, lut_path: Optional[Path], subtitle_path: Optional[str] = None) -> str:
+        """
+        Construct video filter chain (LUT + EQ + Stubbed Upscale + subtitles).
+        
+        subtitle_path is used as given; _execute resolves the config fallback.
+        """
         filters = []
         
         # 1. LUT
         if lut_path and lut_path.exists():
             # Escape path for FFmpeg
-            path_str = str(lut_path).replace("\\", "/").replace(":", "\\:")
+            path_str = self._escape_filter_path(lut_path)
             filters.append(f"lut3d='{path_str}':interp=trilinear")
             
         # 2. Basic EQ (Brightness/Contrast/Saturation)
         # eq=contrast=1.0:brightness=0.0:saturation=1.0
         cfg = self.config
-        if cfg.get("brightness", 0.0) != 0.0 or cfg.get("contrast", 1.0) != 1.0 or cfg.get("saturation", 1.0) != 1.0:
-            filters.append(f"eq=contrast={cfg.get('contrast', 1.0)}:brightness={cfg.get('brightness', 0.0)}:saturation={cfg.get('saturation', 1.0)}")
+        brightness = cfg.get("brightness", 0.0)
+        contrast = cfg.get("contrast", 1.0)
+        saturation = cfg.get("saturation", 1.0)
+        if brightness != 0.0 or contrast != 1.0 or saturation != 1.0:
+            filters.append(f"eq=contrast={contrast}:brightness={brightness}:saturation={saturation}")
 
         # 3. Upscale Stub
         if cfg.get("upscale"):
@@ -91,13 +186,31 @@ class VideoEnhancerAgent(BaseAgent):
         # 4. Denoise Stub
         if cfg.get("denoise"):
              filters.append("hqdn3d=1.5:1.5:6:6") # Simple light denoise
+        
+        # 5. Burned-in subtitles, last so grading/denoise don't touch the text.
+        # Rendering them here saves a second decode/encode of the whole video.
+        if subtitle_path:
+            font_size = cfg.get("subtitle_font_size", 24)
+            font_color = cfg.get("subtitle_font_color", "&HFFFFFF&")
+            filters.append(
+                f"subtitles='{self._escape_filter_path(subtitle_path)}':"
+                f"force_style='FontSize={font_size},PrimaryColour={font_color}'"
+            )
             
         return ",".join(filters) if filters else ""
     
-    def _execute(self, input_path: Path, output_dir: Path) -> Dict[str, Any]:
+    def _execute(
+        self,
+        input_path: Path,
+        output_dir: Path,
+        external_audio_path: Optional[str] = None,
+        subtitle_path: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Enhance video with color grading and encoding.
-        Optionally replace audio if 'external_audio_path' is in config.
+        
+        Optionally replace audio with external_audio_path and burn in
+        subtitle_path; each falls back to the config key of the same name.
         """
         self.validate_input(input_path)
         
@@ -120,16 +233,22 @@ class VideoEnhancerAgent(BaseAgent):
                 self.logger.info(f"Applying LUT: {lut_path.name}")
         
         # Build command
-        video_filter = self._build_video_filter(lut_path)
+        subtitle_path = subtitle_path or self.config.get("subtitle_path")
+        video_filter = self._build_video_filter(lut_path, subtitle_path)
         encoder_args = self._get_encoder_args()
+        decoder_args = self._get_decoder_args(video_filter)
+        if self._needs_hwupload(video_filter):
+            video_filter = f"{video_filter},{self.HWUPLOAD_FILTER}" if video_filter else self.HWUPLOAD_FILTER
         
         cmd = [
             "ffmpeg", "-y", "-hide_banner",
+            *self._filter_thread_args(),  # LUT3D/EQ are CPU-heavy
+            *decoder_args,
             "-i", str(input_path),
         ]
         
         # Audio Muxing Logic
-        external_audio = self.config.get("external_audio_path")
+        external_audio = external_audio_path or self.config.get("external_audio_path")
         if external_audio and Path(external_audio).exists():
             cmd.extend(["-i", external_audio])
             cmd.extend(["-map", "0:v:0", "-map", "1:a:0"]) # Map video from input 0, audio from input 1
@@ -142,6 +261,7 @@ class VideoEnhancerAgent(BaseAgent):
         
         cmd.extend(encoder_args)
         cmd.extend([
+            "-threads", "0",
             "-c:a", "aac", "-b:a", "192k",
             "-movflags", "+faststart",  # Web optimization
             "-loglevel", "error",
@@ -157,18 +277,12 @@ class VideoEnhancerAgent(BaseAgent):
         if not output_path.exists():
             raise RuntimeError("Enhanced video file was not created")
         
-        # Determine which encoder was actually used
-        encoder_used = (
-            self.config.get("hardware_encoder", "h264_videotoolbox")
-            if self.config.get("hardware_acceleration", True) and self._check_hardware_encoder()
-            else self.config.get("software_encoder", "libx264")
-        )
-        
         self.logger.info(f"Video enhanced successfully in {encoding_time:.1f}s")
         
         return {
             "output_path": str(output_path),
             "encoding_time": encoding_time,
-            "encoder_used": encoder_used,
-            "lut_applied": lut_applied
+            "encoder_used": self._encoder_used,
+            "lut_applied": lut_applied,
+            "captions_burned": bool(subtitle_path)
         }
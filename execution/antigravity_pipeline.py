@@ -27,27 +27,131 @@ Programmatic usage:
 
 import os
 import sys
+import copy
 import json
 import time
 import logging
 import argparse
 import shutil
+import subprocess
+import importlib.util
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Callable
+
+# orjson (optional) encodes the processing log several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Add parent to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from agents import (
-    AudioProcessorAgent,
-    CaptionGeneratorAgent,
-    VideoEnhancerAgent,
-    ThumbnailGeneratorAgent,
-    BackupManagerAgent,
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    """Write data as indented JSON, stringifying unknown types."""
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2, default=str))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=str)
+
+
+@lru_cache(maxsize=4)
+def _load_config_cached(config_path: str, mtime: float) -> Dict[str, Any]:
+    """Parse a config file once per (path, mtime). Callers must copy before mutating."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=4)
+def _get_validator(schema_path: str, mtime: float) -> Callable[[Dict[str, Any]], None]:
+    """
+    Load a JSON schema and compile it once per (path, mtime).
+    
+    Returns a function that raises ValueError for an invalid config. Uses a
+    fastjsonschema generated validator when installed, else jsonschema.
+    Raises ImportError if neither library is available.
+    """
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    
+    try:
+        import fastjsonschema
+    except ImportError:
+        fastjsonschema = None
+    
+    if fastjsonschema is not None:
+        compiled = fastjsonschema.compile(schema)
+        
+        def validate(config: Dict[str, Any]) -> None:
+            try:
+                compiled(config)
+            except fastjsonschema.JsonSchemaException as e:
+                raise ValueError(f"Config validation failed: {e.message}")
+        
+        return validate
+    
+    import jsonschema
+    
+    validator_cls = jsonschema.validators.validator_for(schema)
+    validator_cls.check_schema(schema)
+    validator = validator_cls(schema)
+    
+    def validate(config: Dict[str, Any]) -> None:
+        error = jsonschema.exceptions.best_match(validator.iter_errors(config))
+        if error is not None:
+            raise ValueError(f"Config validation failed: {error.message}")
+    
+    return validate
+
+
+# Shared by every orchestrator's console handler
+_LOG_FORMATTER = logging.Formatter(
+    "%(asctime)s | %(levelname)-7s | %(message)s",
+    datefmt="%H:%M:%S"
 )
 
 
+# Set once `ffmpeg -version` has run; failures are never stored
+_ffmpeg_found = False
+
+
+def _ffmpeg_available() -> bool:
+    """
+    Check whether ffmpeg can be executed.
+    
+    A successful probe is cached for the process lifetime. A failure (missing
+    binary, timeout) is re-checked on the next call, so one transient error
+    doesn't report ffmpeg missing for good.
+    """
+    global _ffmpeg_found
+    if _ffmpeg_found:
+        return True
+    try:
+        subprocess.run(
+            ["ffmpeg", "-version"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=5
+        )
+    except Exception:
+        return False
+    _ffmpeg_found = True
+    return True
+
+
+@lru_cache(maxsize=1)
+def _whisper_available() -> bool:
+    """Check whether whisper is installed without importing it (and torch)."""
+    if "whisper" in sys.modules:
+        return True
+    return importlib.util.find_spec("whisper") is not None
+
+
 class VideoPipelineOrchestrator:
     """
     Main orchestrator for video production pipeline.
@@ -59,26 +163,42 @@ class VideoPipelineOrchestrator:
     4. VideoEnhancerAgent - Apply LUT and re-encode
     5. ThumbnailGeneratorAgent - Extract thumbnails
     
+    With pipeline.parallel, phases 2, 3 and 5 run concurrently.
+    
     Returns a result dict with all output paths and timing.
     """
     
     DEFAULT_CONFIG_PATH = Path(__file__).parent / "production_config.json"
     SCHEMA_PATH = Path(__file__).parent / "config_schema.json"
+    BANNER = "=" * 50
     
-    def __init__(self, config_path: Optional[str] = None, logger: Optional[logging.Logger] = None):
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        logger: Optional[logging.Logger] = None,
+        config: Optional[Dict[str, Any]] = None,
+    ):
         """
         Initialize orchestrator with configuration.
         
         Args:
             config_path: Path to config JSON (uses default if not provided)
             logger: Optional logger instance
+            config: Already-parsed config dict; skips reading config_path
         """
         self.config_path = Path(config_path) if config_path else self.DEFAULT_CONFIG_PATH
         self.logger = logger or self._setup_logger()
-        self.config = self._load_config()
+        if config is not None:
+            # Still validated below; copied so the caller's dict is never mutated
+            self.config = copy.deepcopy(config)
+        else:
+            self.config = self._load_config()
         self._validate_config()
         
-        self.logger.info(f"Loaded config from {self.config_path}")
+        if config is not None:
+            self.logger.info("Loaded config from dict")
+        else:
+            self.logger.info(f"Loaded config from {self.config_path}")
     
     def _setup_logger(self) -> logging.Logger:
         """Create logger with console handler."""
@@ -87,10 +207,7 @@ class VideoPipelineOrchestrator:
         
         if not logger.handlers:
             handler = logging.StreamHandler()
-            handler.setFormatter(logging.Formatter(
-                "%(asctime)s | %(levelname)-7s | %(message)s",
-                datefmt="%H:%M:%S"
-            ))
+            handler.setFormatter(_LOG_FORMATTER)
             logger.addHandler(handler)
         
         return logger
@@ -100,18 +217,17 @@ class VideoPipelineOrchestrator:
         if not self.config_path.exists():
             raise FileNotFoundError(f"Config file not found: {self.config_path}")
         
-        with open(self.config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        # Parsed once per file version; each orchestrator gets its own copy
+        cached = _load_config_cached(str(self.config_path.resolve()), self.config_path.stat().st_mtime)
+        return copy.deepcopy(cached)
     
     def _validate_config(self) -> bool:
         """Validate config against JSON schema."""
         try:
-            import jsonschema
-            
             if self.SCHEMA_PATH.exists():
-                with open(self.SCHEMA_PATH, "r", encoding="utf-8") as f:
-                    schema = json.load(f)
-                jsonschema.validate(self.config, schema)
+                # Compiled validator is reused until the schema file changes
+                validate = _get_validator(str(self.SCHEMA_PATH), self.SCHEMA_PATH.stat().st_mtime)
+                validate(self.config)
                 self.logger.debug("Config validated against schema")
             else:
                 self.logger.warning(f"Schema not found: {self.SCHEMA_PATH}")
@@ -119,14 +235,15 @@ class VideoPipelineOrchestrator:
             return True
             
         except ImportError:
-            self.logger.warning("jsonschema not installed, skipping validation")
+            self.logger.warning("fastjsonschema/jsonschema not installed, skipping validation")
             return True
-        except jsonschema.ValidationError as e:
-            raise ValueError(f"Config validation failed: {e.message}")
     
-    def _apply_overrides(self, overrides: Dict[str, Any]) -> Dict[str, Any]:
+    def _apply_overrides(self, overrides: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         """Deep merge config overrides into base config."""
-        config = json.loads(json.dumps(self.config))  # Deep copy
+        # Agents and CI defaults mutate config sections in place, so nothing may share self.config
+        config = copy.deepcopy(self.config)
+        if not overrides:
+            return config
         
         def merge(base: Dict, updates: Dict) -> Dict:
             for key, value in updates.items():
@@ -149,6 +266,15 @@ class VideoPipelineOrchestrator:
     
     def _create_agents(self, config: Dict[str, Any]) -> Dict[str, Any]:
         """Instantiate all agents with config sections."""
+        # Imported here so --dry-run, --help and importers that never process skip the agent modules
+        from agents import (
+            AudioProcessorAgent,
+            CaptionGeneratorAgent,
+            VideoEnhancerAgent,
+            ThumbnailGeneratorAgent,
+            BackupManagerAgent,
+        )
+        
         return {
             "backup": BackupManagerAgent(config.get("backup", {}), self.logger),
             "audio": AudioProcessorAgent(config.get("audio", {}), self.logger),
@@ -167,19 +293,18 @@ class VideoPipelineOrchestrator:
         log_dir = output_dir / self.config.get("logging", {}).get("output_dir", "logs")
         log_dir.mkdir(parents=True, exist_ok=True)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_path = log_dir / f"processing_log_{timestamp}.json"
+        now = datetime.now()
+        log_path = log_dir / f"processing_log_{now:%Y%m%d_%H%M%S}.json"
         
         log_data = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "config_path": str(self.config_path),
             "total_time_seconds": round(total_time, 2),
             "agent_results": results,
             "success": all(r.get("success", False) for r in results.values())
         }
         
-        with open(log_path, "w", encoding="utf-8") as f:
-            json.dump(log_data, f, indent=2, default=str)
+        _write_json(log_path, log_data)
         
         return str(log_path)
     
@@ -207,7 +332,8 @@ class VideoPipelineOrchestrator:
                 "error_messages": list[str]
             }
         """
-        start_time = time.time()
+        # Monotonic: durations are unaffected by wall-clock adjustments
+        start_time = time.perf_counter()
         video_path = Path(video_path)
         
         if not video_path.exists():
@@ -220,16 +346,29 @@ class VideoPipelineOrchestrator:
             output_dir = video_path.parent / f"{video_path.stem}_output"
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        self.logger.info(f"=" * 50)
-        self.logger.info(f"🎬 Antigravity Video Pipeline")
-        self.logger.info(f"   Input: {video_path.name}")
-        self.logger.info(f"   Output: {output_dir}")
-        self.logger.info(f"=" * 50)
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(self.BANNER)
+            self.logger.info("🎬 Antigravity Video Pipeline")
+            self.logger.info(f"   Input: {video_path.name}")
+            self.logger.info(f"   Output: {output_dir}")
+            self.logger.info(self.BANNER)
         
         # Prepare config
-        config = self._apply_overrides(config_overrides or {})
+        config = self._apply_overrides(config_overrides)
         config = self._apply_ci_safety(config)
         
+        # Burned captions are rendered during the video enhancement encode
+        # instead of a separate full re-encode by the caption agent
+        captions_config = config.get("captions", {})
+        burn_captions = captions_config.get("burn_captions", False)
+        if burn_captions:
+            config["captions"] = {**captions_config, "burn_captions": False}
+            config["video"] = {
+                **config.get("video", {}),
+                "subtitle_font_size": captions_config.get("font_size", 24),
+                "subtitle_font_color": captions_config.get("font_color", "&HFFFFFF&"),
+            }
+        
         # Create agents
         agents = self._create_agents(config)
         
@@ -240,60 +379,85 @@ class VideoPipelineOrchestrator:
         
         # 1. Backup
         self.logger.info("\n📦 Phase 1: Backup")
-        results["backup"] = agents["backup"].process(str(video_path), str(output_dir))
-        
-        # 2. Audio Processing
-        self.logger.info("\n🎵 Phase 2: Audio Processing")
-        results["audio"] = agents["audio"].process(str(video_path), str(output_dir))
-        if not results["audio"]["success"]:
-            error_messages.append(results["audio"].get("error", "Audio processing failed"))
-            if fail_fast:
-                return self._build_result(results, output_dir, time.time() - start_time, error_messages)
-        
-        # 3. Caption Generation
-        self.logger.info("\n📝 Phase 3: Caption Generation")
-        results["captions"] = agents["captions"].process(str(video_path), str(output_dir))
-        if not results["captions"]["success"]:
-            error_messages.append(results["captions"].get("error", "Caption generation failed"))
-            if fail_fast:
-                return self._build_result(results, output_dir, time.time() - start_time, error_messages)
-        
-        # 4. Video Enhancement (Merge Audio if available)
-        self.logger.info("\n🎨 Phase 4: Video Enhancement")
-        
-        # Phase 3 Requirement: Merge media outputs
-        # If we have normalized audio, we should use it for the video enhancement output
-        video_config_overrides = {}
-        processed_audio = results.get("audio", {}).get("output_path")
-        
-        if processed_audio:
-            self.logger.info(f"   Merging processed audio: {Path(processed_audio).name}")
-            # We inject the audio path as an override or extra arg
-            # However, since BaseAgent interface is fixed, we can pass it via config or modify the agent to accept 'audio_track'
-            # Let's use a config override approach for the agent to pick up
-            video_config_overrides["external_audio_path"] = processed_audio
-
-        # Apply temporary overrides to the agent instance
-        original_video_config = agents["video"].config.copy()
-        agents["video"].config.update(video_config_overrides)
-        
-        results["video"] = agents["video"].process(str(video_path), str(output_dir))
-        
-        # Restore config
-        agents["video"].config = original_video_config
+        results["backup"] = agents["backup"].process(video_path, output_dir)
+        
+        # Audio, captions and thumbnails only read the input video, so in
+        # parallel mode they start together; phase 4 waits on what it needs
+        futures: Dict[str, Future] = {}
+        pool = ThreadPoolExecutor(max_workers=3) if config.get("pipeline", {}).get("parallel", False) else None
+        if pool is not None:
+            self.logger.info("\n⚡ Running audio, captions and thumbnails in parallel")
+            for name in ("audio", "captions", "thumbnails"):
+                futures[name] = pool.submit(agents[name].process, video_path, output_dir)
+        
+        def run_phase(name: str) -> Dict[str, Any]:
+            if name in futures:
+                return futures[name].result()
+            return agents[name].process(video_path, output_dir)
         
-        if not results["video"]["success"]:
-            error_messages.append(results["video"].get("error", "Video enhancement failed"))
-            if fail_fast:
-                return self._build_result(results, output_dir, time.time() - start_time, error_messages)
-        
-        # 5. Thumbnail Generation
-        self.logger.info("\n🖼️  Phase 5: Thumbnail Generation")
-        results["thumbnails"] = agents["thumbnails"].process(str(video_path), str(output_dir))
-        if not results["thumbnails"]["success"]:
-            error_messages.append(results["thumbnails"].get("error", "Thumbnail generation failed"))
-        
-        total_time = time.time() - start_time
+        try:
+            # 2. Audio Processing
+            self.logger.info("\n🎵 Phase 2: Audio Processing")
+            results["audio"] = run_phase("audio")
+            if not results["audio"]["success"]:
+                error_messages.append(results["audio"].get("error", "Audio processing failed"))
+                if fail_fast:
+                    return self._build_result(results, output_dir, time.perf_counter() - start_time, error_messages)
+            
+            # 3. Caption Generation
+            self.logger.info("\n📝 Phase 3: Caption Generation")
+            results["captions"] = run_phase("captions")
+            if not results["captions"]["success"]:
+                error_messages.append(results["captions"].get("error", "Caption generation failed"))
+                if fail_fast:
+                    return self._build_result(results, output_dir, time.perf_counter() - start_time, error_messages)
+            
+            # 4. Video Enhancement (Merge Audio if available)
+            self.logger.info("\n🎨 Phase 4: Video Enhancement")
+            
+            # Phase 3 Requirement: Merge media outputs
+            # If we have normalized audio, we should use it for the video enhancement output
+            video_options = {}
+            processed_audio = results.get("audio", {}).get("output_path")
+            
+            if processed_audio:
+                self.logger.info(f"   Merging processed audio: {Path(processed_audio).name}")
+                video_options["external_audio_path"] = processed_audio
+            
+            srt_path = results.get("captions", {}).get("srt_path")
+            if burn_captions and srt_path:
+                self.logger.info(f"   Burning captions: {Path(srt_path).name}")
+                video_options["subtitle_path"] = srt_path
+            
+            # Passed per call rather than patched into the agent's config
+            results["video"] = agents["video"].process(video_path, output_dir, **video_options)
+            
+            if not results["video"]["success"]:
+                error_messages.append(results["video"].get("error", "Video enhancement failed"))
+                if fail_fast:
+                    return self._build_result(results, output_dir, time.perf_counter() - start_time, error_messages)
+            
+            # 5. Thumbnail Generation
+            self.logger.info("\n🖼️  Phase 5: Thumbnail Generation")
+            
+            # The audio phase already read the input's duration/size; reuse them instead of re-probing
+            # (in parallel mode thumbnails started before audio finished, so they probe themselves)
+            input_duration = results.get("audio", {}).get("input_duration")
+            if input_duration and "thumbnails" not in futures:
+                results["thumbnails"] = agents["thumbnails"].process(
+                    video_path, output_dir,
+                    video_duration=input_duration,
+                    video_size=results["audio"].get("input_video_size")
+                )
+            else:
+                results["thumbnails"] = run_phase("thumbnails")
+            if not results["thumbnails"]["success"]:
+                error_messages.append(results["thumbnails"].get("error", "Thumbnail generation failed"))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+        
+        total_time = time.perf_counter() - start_time
         return self._build_result(results, output_dir, total_time, error_messages)
     
     def _build_result(
@@ -318,11 +482,12 @@ class VideoPipelineOrchestrator:
             "error_messages": error_messages,
         }
         
-        self.logger.info("\n" + "=" * 50)
-        self.logger.info("📊 Pipeline Complete")
-        self.logger.info(f"   Total time: {total_time:.1f}s")
-        self.logger.info(f"   Errors: {len(error_messages)}")
-        self.logger.info("=" * 50)
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("\n" + self.BANNER)
+            self.logger.info("📊 Pipeline Complete")
+            self.logger.info(f"   Total time: {total_time:.1f}s")
+            self.logger.info(f"   Errors: {len(error_messages)}")
+            self.logger.info(self.BANNER)
         
         return result
     
@@ -357,20 +522,11 @@ class VideoPipelineOrchestrator:
     
     def _check_ffmpeg(self) -> bool:
         """Check if FFmpeg is available."""
-        import subprocess
-        try:
-            subprocess.run(["ffmpeg", "-version"], capture_output=True, timeout=5)
-            return True
-        except Exception:
-            return False
+        return _ffmpeg_available()
     
     def _check_whisper(self) -> bool:
         """Check if Whisper is available."""
-        try:
-            import whisper
-            return True
-        except ImportError:
-            return False
+        return _whisper_available()
 
 
 def main():
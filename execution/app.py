@@ -18,6 +18,13 @@ st.set_page_config(
     layout="wide"
 )
 
+
+@st.cache_resource
+def get_orchestrator() -> VideoPipelineOrchestrator:
+    """Load and validate the default config once per server process."""
+    return VideoPipelineOrchestrator()
+
+
 st.title("🎬 Antigravity Video Production Pipeline")
 st.markdown("Automated video post-production: Audio Norm, Captions, Color Grade, and more.")
 
@@ -55,8 +62,9 @@ if uploaded_file:
             
             # Save uploaded file
             input_path = tmp_path / uploaded_file.name
+            uploaded_file.seek(0)
             with open(input_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+                shutil.copyfileobj(uploaded_file, f, length=1 << 20)
             
             # Setup Config Override
             overrides = {
@@ -87,8 +95,8 @@ if uploaded_file:
             # The orchestrator `process` method accepts `config_overrides`!
             # But the `__init__` loads the base config.
             
-            # We will init orchestrator with default config, then pass overrides to process()
-            orchestrator = VideoPipelineOrchestrator() # Loads default production_config.json
+            # Shared orchestrator with the default config; per-run settings go through overrides
+            orchestrator = get_orchestrator()
             
             # Create output dir
             output_dir = Path("output_web") / f"run_{int(time.time())}"
@@ -137,8 +145,12 @@ if uploaded_file:
                                     st.download_button("Download Captions (.srt)", f, "captions.srt")
                                     
                             if "audio_normalized_path" in result and Path(result["audio_normalized_path"]).exists():
-                                with open(result["audio_normalized_path"], "rb") as f:
-                                    st.download_button("Download Audio (.wav)", f, "audio.wav")
+                                audio_path = Path(result["audio_normalized_path"])
+                                # FLAC by default; follows the audio output_codec
+                                with open(audio_path, "rb") as f:
+                                    st.download_button(
+                                        f"Download Audio ({audio_path.suffix})", f, f"audio{audio_path.suffix}"
+                                    )
                             
                             st.caption("Thumbnails:")
                             if "thumbnail_paths" in result:
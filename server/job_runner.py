@@ -1,22 +1,47 @@
+import asyncio
 import shutil
 import os
-import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import UploadFile
 from typing import Dict, Any
-from audio_engine.processor import run_job, TEMP_DIR
+from audio_engine.processor import run_job, TEMP_DIR, OUTPUT_DIR
+
+# orjson (optional) parses preset JSON in C; same loads() signature as json
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# Upload copy buffer size
+COPY_CHUNK = 1 << 20
+
+# Jobs spend their time in ffmpeg child processes, so threads don't contend on the GIL.
+# Cap concurrent jobs like run_jobs does instead of sharing the default to_thread pool.
+_job_pool = ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2), thread_name_prefix="job")
+
+def _save_upload(src, dest_path: str):
+    with open(dest_path, "wb") as buffer:
+        shutil.copyfileobj(src, buffer, COPY_CHUNK)
 
 async def process_upload(file: UploadFile, preset_json: str) -> Dict[str, Any]:
     # Parse preset
-    preset = json.loads(preset_json)
+    preset = _json.loads(preset_json)
     
-    # Save Upload
-    temp_path = os.path.join(TEMP_DIR, file.filename)
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Save Upload (blocking file IO runs in a worker thread, not on the event loop).
+    # Each request gets its own directory so concurrent uploads never share a path.
+    upload_dir = tempfile.mkdtemp(prefix="upload_", dir=TEMP_DIR)
+    temp_path = os.path.join(upload_dir, os.path.basename(file.filename))
+    await asyncio.to_thread(_save_upload, file.file, temp_path)
         
+    # Jobs run concurrently, so each writes processed_<basename> into its own directory (as run_jobs does)
+    output_dir = tempfile.mkdtemp(prefix="job_", dir=OUTPUT_DIR)
+    
     try:
-        # Run Job
-        report = run_job(temp_path, preset)
+        # Run Job (ffmpeg passes take seconds to minutes; keep the loop serving requests)
+        report = await asyncio.get_running_loop().run_in_executor(
+            _job_pool, run_job, temp_path, preset, output_dir
+        )
         return report
     finally:
         # Cleanup input (optional, maybe keep for debugging in early dev)
@@ -8,7 +8,8 @@ app = FastAPI()
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # For local dev
+    # Local dev frontends on any port; Starlette compiles this once and fullmatches it per request
+    allow_origin_regex=r"https?://(localhost|127\.0\.0\.1)(:\d+)?",
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -31,7 +32,7 @@ def get_preset(name: str):
 
 @app.post("/presets/{name}")
 def save_preset(name: str, preset: PresetModel):
-    preset_store.update_preset(name, preset.dict())
+    preset_store.update_preset(name, preset.model_dump())
     return {"status": "saved", "name": name}
 
 @app.post("/process_upload")
@@ -1,31 +1,53 @@
+import copy
 import yaml
 import os
+from functools import lru_cache
 from typing import Dict, Any, List
 
+# libyaml's C loader/dumper are an order of magnitude faster when available
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config", "auphonic_presets.yaml")
 
-def load_presets() -> Dict[str, Any]:
-    if not os.path.exists(CONFIG_PATH):
-        return {}
+@lru_cache(maxsize=1)
+def _load_presets_cached(mtime_ns: int) -> Dict[str, Any]:
+    # Keyed by mtime so edits made outside this process are picked up
     with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f)
-    return data.get("presets", {})
+        data = yaml.load(f, Loader=SafeLoader)
+    return (data or {}).get("presets", {})
+
+def _get_cached_presets() -> Dict[str, Any]:
+    # Shared parse result: read-only for callers
+    try:
+        mtime_ns = os.stat(CONFIG_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _load_presets_cached(mtime_ns)
+
+def load_presets() -> Dict[str, Any]:
+    # Callers may mutate the result, so hand out a copy of the cached parse
+    return copy.deepcopy(_get_cached_presets())
 
 def save_presets(presets: Dict[str, Any]):
     # ensure dir exists
     os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
     with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        yaml.safe_dump({"presets": presets}, f, default_flow_style=False, sort_keys=False)
+        yaml.dump({"presets": presets}, f, Dumper=SafeDumper, default_flow_style=False, sort_keys=False)
+    # A rewrite within the filesystem's mtime granularity would otherwise look unchanged
+    _load_presets_cached.cache_clear()
 
 def get_preset(name: str) -> Dict[str, Any] | None:
-    presets = load_presets()
-    return presets.get(name)
+    preset = _get_cached_presets().get(name)
+    return copy.deepcopy(preset) if preset is not None else None
 
 def update_preset(name: str, data: Dict[str, Any]):
-    presets = load_presets()
+    # Only the top level changes; untouched presets are dumped from the cache as-is
+    presets = dict(_get_cached_presets())
     presets[name] = data
     save_presets(presets)
 
 def list_preset_names() -> List[str]:
-    presets = load_presets()
-    return list(presets.keys())
+    return list(_get_cached_presets())
@@ -1,9 +1,48 @@
 #!/usr/bin/env python3
 """pytest configuration for Video Pipeline tests."""
 
+import contextlib
+import subprocess
 import sys
 from pathlib import Path
+from types import ModuleType, SimpleNamespace
+
+import pytest
 
 # Add execution directory to path for imports
 execution_dir = Path(__file__).parent.parent / "execution"
 sys.path.insert(0, str(execution_dir))
+
+# Never load real Whisper models; tests patch whisper.load_model on this stub
+_whisper_stub = ModuleType("whisper")
+_whisper_stub.load_model = lambda *args, **kwargs: SimpleNamespace(
+    transcribe=lambda *args, **kwargs: {"segments": []}
+)
+_whisper_stub.model = SimpleNamespace(LayerNorm=type("LayerNorm", (), {}))
+sys.modules["whisper"] = _whisper_stub
+
+# Whisper's torch dependency, CPU-only; tests that need CUDA patch in their own
+_torch_stub = ModuleType("torch")
+_torch_stub.cuda = SimpleNamespace(is_available=lambda: False)
+_torch_stub.no_grad = contextlib.nullcontext
+sys.modules["torch"] = _torch_stub
+
+from execution.agents import caption_generator
+# The pipeline imports the agents as a top-level package, so both copies get patched
+from agents import caption_generator as pipeline_caption_generator
+
+# Default subprocess.run result; tests that inspect calls patch subprocess.run themselves
+_OK = SimpleNamespace(returncode=0, stdout="", stderr="")
+
+
+@pytest.fixture(autouse=True)
+def isolated_transcription_cache(tmp_path, monkeypatch):
+    """Keep the on-disk transcription cache out of the user's home directory."""
+    for module in (caption_generator, pipeline_caption_generator):
+        monkeypatch.setattr(module, "TRANSCRIPTION_CACHE_DIR", tmp_path / "whisper_cache")
+
+
+@pytest.fixture(autouse=True)
+def no_real_subprocess(monkeypatch):
+    """Stub subprocess.run so no test spawns ffmpeg/ffprobe by accident."""
+    monkeypatch.setattr(subprocess, "run", lambda *args, **kwargs: _OK)
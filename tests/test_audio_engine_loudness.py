@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Unit tests for audio_engine.loudness."""
+
+import io
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from audio_engine import loudness, metrics
+
+# Tail of the ebur128 measurement pass
+EBUR128_STDERR = b"""[Parsed_ebur128_0 @ 0x55d0] Summary:
+
+  Integrated loudness:
+    I:         -27.6 LUFS
+    Threshold: -39.2 LUFS
+
+  Loudness range:
+    LRA:        18.1 LU
+
+  True peak:
+    Peak:       -4.5 dBFS
+"""
+
+# Tail of a loudnorm apply pass with print_format=json
+LOUDNORM_STDERR = b"""[Parsed_loudnorm_0 @ 0x55d0]
+{
+\t"input_i" : "-27.61",
+\t"input_tp" : "-4.47",
+\t"input_lra" : "18.06",
+\t"input_thresh" : "-39.20",
+\t"output_i" : "-16.02",
+\t"output_tp" : "-1.50",
+\t"output_lra" : "14.78",
+\t"output_thresh" : "-27.71",
+\t"normalization_type" : "linear",
+\t"target_offset" : "0.02"
+}
+"""
+
+
+def _fake_proc(stderr: bytes):
+    """Stand-in for a successful Popen object."""
+    return SimpleNamespace(stderr=io.BytesIO(stderr), returncode=0, wait=lambda: 0)
+
+
+@pytest.fixture
+def mock_popen(tmp_path, monkeypatch):
+    """Patch Popen for run_ffmpeg; tests set side_effect to each run's stderr."""
+    monkeypatch.setattr(metrics, "CACHE_PATH", str(tmp_path / "cache" / ".probe_cache.json"))
+    monkeypatch.setattr(metrics, "_loudness_cache", None)
+    with patch.object(metrics.subprocess, "Popen") as mock:
+        yield mock
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "in.wav"
+    path.write_bytes(b"audio")
+    return str(path)
+
+
+def _filter(cmd: list) -> str:
+    return cmd[cmd.index("-af") + 1]
+
+
+class TestNormalizeAudio:
+    """Tests for normalize_audio."""
+
+    def test_one_pass_runs_single_dynamic_loudnorm(self, mock_popen, input_file, tmp_path):
+        """Test that one_pass skips the measurement decode and reports loudnorm's stats."""
+        mock_popen.side_effect = [_fake_proc(LOUDNORM_STDERR)]
+
+        result = loudness.normalize_audio(input_file, str(tmp_path / "out.wav"), target_lufs=-16, one_pass=True)
+
+        assert mock_popen.call_count == 1
+        af = _filter(mock_popen.call_args[0][0])
+        assert af.startswith("loudnorm=I=-16:")
+        assert "print_format=json" in af
+        assert "measured_I" not in af
+        assert result["input_i"] == "-27.61"
+        assert result["output_i"] == "-16.02"
+
+    def test_two_pass_feeds_measurements_into_apply_pass(self, mock_popen, input_file, tmp_path):
+        """Test that the ebur128 stats are applied linearly and output_* stats are merged."""
+        mock_popen.side_effect = [_fake_proc(EBUR128_STDERR), _fake_proc(LOUDNORM_STDERR)]
+
+        result = loudness.normalize_audio(input_file, str(tmp_path / "out.wav"), target_lufs=-16, true_peak=-2)
+
+        measure_cmd, apply_cmd = (c[0][0] for c in mock_popen.call_args_list)
+        assert _filter(measure_cmd) == "ebur128=peak=true:framelog=verbose"
+        needles = ("measured_I=-27.6", "measured_TP=-4.5", "measured_LRA=18.1",
+                   "measured_thresh=-39.2", "offset=0.0", "linear=true", "print_format=json")
+        missing = [n for n in needles if n not in _filter(apply_cmd)]
+        assert not missing, f"missing: {missing}"
+        assert result["input_i"] == "-27.6"
+        assert result["output_i"] == "-16.02"
+        assert result["output_tp"] == "-1.50"
+
+    def test_fast_peak_keeps_true_peak_limiter(self, mock_popen, input_file, tmp_path):
+        """Test that a sample-peak measurement never reaches measured_TP or linear mode."""
+        mock_popen.side_effect = [_fake_proc(EBUR128_STDERR), _fake_proc(LOUDNORM_STDERR)]
+
+        loudness.normalize_audio(input_file, str(tmp_path / "out.wav"), true_peak=-1, fast_peak=True)
+
+        measure_cmd, apply_cmd = (c[0][0] for c in mock_popen.call_args_list)
+        af = _filter(apply_cmd)
+        assert "peak=sample" in _filter(measure_cmd)
+        assert ":TP=-1:" in af
+        assert "measured_TP" not in af
+        assert "linear=true" not in af
+        assert "measured_I=-27.6" in af
+
+    def test_unparseable_apply_stats_return_input_measurements(self, mock_popen, input_file, tmp_path):
+        """Test that missing loudnorm JSON leaves output_* out so the caller re-measures."""
+        mock_popen.side_effect = [_fake_proc(EBUR128_STDERR), _fake_proc(b"size=N/A time=00:00:10.00")]
+
+        result = loudness.normalize_audio(input_file, str(tmp_path / "out.wav"))
+
+        assert result["input_i"] == "-27.6"
+        assert not any(key.startswith("output_") for key in result)
+
+    def test_mp3_output_uses_lame(self, mock_popen, input_file, tmp_path):
+        """Test the encoder arguments for mp3 outputs."""
+        mock_popen.side_effect = [_fake_proc(LOUDNORM_STDERR)]
+
+        loudness.normalize_audio(input_file, str(tmp_path / "out.mp3"), one_pass=True)
+
+        cmd = mock_popen.call_args[0][0]
+        assert cmd[cmd.index("-c:a") + 1] == "libmp3lame"
+        assert cmd[-1] == str(tmp_path / "out.mp3")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Unit tests for audio_engine.metrics."""
+
+import io
+import json
+import os
+import subprocess
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from audio_engine import metrics
+
+# Tail of an ffmpeg run with -af ebur128
+EBUR128_STDERR = b"""[Parsed_ebur128_0 @ 0x55d0] Summary:
+
+  Integrated loudness:
+    I:         -23.0 LUFS
+    Threshold: -33.5 LUFS
+
+  Loudness range:
+    LRA:         5.2 LU
+    Threshold: -43.5 LUFS
+    LRA low:   -26.1 LUFS
+    LRA high:  -21.0 LUFS
+
+  True peak:
+    Peak:       -3.1 dBFS
+"""
+
+EBUR128_MEASUREMENTS = {"input_i": "-23.0", "input_tp": "-3.1", "input_lra": "5.2", "input_thresh": "-33.5"}
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    """Point the persistent loudness cache at a fresh file."""
+    path = tmp_path / "temp" / ".probe_cache.json"
+    monkeypatch.setattr(metrics, "CACHE_PATH", str(path))
+    monkeypatch.setattr(metrics, "_loudness_cache", None)
+    return path
+
+
+@pytest.fixture
+def mock_ffmpeg():
+    """Stub run_ffmpeg with an ebur128 summary."""
+    with patch.object(metrics, "run_ffmpeg", return_value=EBUR128_STDERR) as mock:
+        yield mock
+
+
+def _fake_proc(stderr: bytes, returncode: int = 0):
+    """Stand-in for a Popen object; BytesIO provides the read1() run_ffmpeg uses."""
+    return SimpleNamespace(stderr=io.BytesIO(stderr), returncode=returncode, wait=lambda: returncode)
+
+
+def _media(tmp_path, name, content=b"audio"):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+class TestParseEbur128Summary:
+    """Tests for parse_ebur128_summary."""
+
+    def test_parses_summary(self):
+        """Test that the summary block yields loudnorm-style string stats."""
+        assert metrics.parse_ebur128_summary(EBUR128_STDERR) == EBUR128_MEASUREMENTS
+
+    def test_uses_last_summary(self):
+        """Test that per-frame lines before the summary are ignored."""
+        stderr = b"[Parsed_ebur128_0] t: 0.1 M: -30.0 S: -40.0 I: -70.0 LUFS LRA: 0.0 LU\n" + EBUR128_STDERR
+        assert metrics.parse_ebur128_summary(stderr)["input_i"] == "-23.0"
+
+    def test_silent_input(self):
+        """Test that -inf loudness and peak are passed through."""
+        stderr = EBUR128_STDERR.replace(b"-23.0 LUFS", b"-inf LUFS").replace(b"-3.1 dBFS", b"-inf dBFS")
+        result = metrics.parse_ebur128_summary(stderr)
+
+        assert result["input_i"] == "-inf"
+        assert result["input_tp"] == "-inf"
+
+    def test_missing_summary_raises(self):
+        """Test that output without a summary raises ValueError."""
+        with pytest.raises(ValueError):
+            metrics.parse_ebur128_summary(b"Error opening input file")
+
+
+class TestParseLoudnormOutput:
+    """Tests for parse_loudnorm_output."""
+
+    def test_takes_last_json_block(self):
+        """Test that the last print_format=json block is used."""
+        stderr = (
+            b'{"input_i" : "-30.00"}\n'
+            b'[Parsed_loudnorm_0 @ 0x55d0]\n'
+            b'{\n\t"input_i" : "-23.00",\n\t"output_i" : "-16.01"\n}\n'
+        )
+        result = metrics.parse_loudnorm_output(stderr)
+
+        assert result == {"input_i": "-23.00", "output_i": "-16.01"}
+
+    def test_missing_json_raises(self):
+        """Test that output without a JSON block raises ValueError."""
+        with pytest.raises(ValueError):
+            metrics.parse_loudnorm_output(b"size=N/A time=00:00:10.00")
+
+
+class TestRunFfmpeg:
+    """Tests for run_ffmpeg."""
+
+    def test_returns_stderr(self):
+        """Test that stderr is collected from the spawned process."""
+        with patch.object(metrics.subprocess, "Popen", return_value=_fake_proc(EBUR128_STDERR)) as mock_popen:
+            err = metrics.run_ffmpeg(["ffmpeg", "-i", "in.wav"])
+
+        assert err == EBUR128_STDERR
+        assert mock_popen.call_args[0][0] == ["ffmpeg", "-i", "in.wav"]
+
+    def test_keeps_only_the_tail(self):
+        """Test that stderr beyond tail_chunks * 4 KiB is dropped from the front."""
+        stderr = b"x" * (10 * metrics._STDERR_CHUNK) + EBUR128_STDERR
+        with patch.object(metrics.subprocess, "Popen", return_value=_fake_proc(stderr)):
+            err = metrics.run_ffmpeg(["ffmpeg"], tail_chunks=2)
+
+        assert len(err) <= 2 * metrics._STDERR_CHUNK
+        assert err.endswith(EBUR128_STDERR)
+
+    def test_nonzero_exit_raises_with_stderr(self):
+        """Test that a failed run raises CalledProcessError carrying the stderr tail."""
+        with patch.object(metrics.subprocess, "Popen", return_value=_fake_proc(b"No such file", returncode=1)):
+            with pytest.raises(subprocess.CalledProcessError) as exc_info:
+                metrics.run_ffmpeg(["ffmpeg"])
+
+        assert exc_info.value.stderr == b"No such file"
+
+
+class TestMeasureLoudnessCache:
+    """Tests for the persistent loudness cache."""
+
+    def test_unchanged_file_is_measured_once(self, cache_path, mock_ffmpeg, tmp_path):
+        """Test that a second measurement of the same file is served from the cache."""
+        path = _media(tmp_path, "in.wav")
+
+        assert metrics.measure_loudness(path) == EBUR128_MEASUREMENTS
+        assert metrics.measure_loudness(path) == EBUR128_MEASUREMENTS
+        assert mock_ffmpeg.call_count == 1
+
+    def test_changed_file_replaces_its_entry(self, cache_path, mock_ffmpeg, tmp_path):
+        """Test that a modified file is re-measured without adding a second entry."""
+        path = _media(tmp_path, "in.wav")
+        metrics.measure_loudness(path)
+
+        with open(path, "ab") as f:
+            f.write(b"more")
+        metrics.measure_loudness(path)
+
+        assert mock_ffmpeg.call_count == 2
+        assert len(json.loads(cache_path.read_text())) == 1
+
+    def test_peak_modes_cached_separately(self, cache_path, mock_ffmpeg, tmp_path):
+        """Test that sample and true peak measurements don't share an entry."""
+        path = _media(tmp_path, "in.wav")
+        metrics.measure_loudness(path, peak_mode="true")
+        metrics.measure_loudness(path, peak_mode="sample")
+
+        assert mock_ffmpeg.call_count == 2
+
+    def test_cache_size_is_capped(self, cache_path, mock_ffmpeg, tmp_path, monkeypatch):
+        """Test that the oldest entries are evicted beyond CACHE_MAX_ENTRIES."""
+        monkeypatch.setattr(metrics, "CACHE_MAX_ENTRIES", 2)
+        paths = [_media(tmp_path, f"in{i}.wav") for i in range(3)]
+        for path in paths:
+            metrics.measure_loudness(path)
+
+        cached = json.loads(cache_path.read_text())
+        assert list(cached) == [metrics._cache_key(p, "true") for p in paths[1:]]
+
+    def test_entries_from_other_processes_are_kept(self, cache_path, mock_ffmpeg, tmp_path):
+        """Test that storing merges with entries written since the cache was loaded."""
+        first = _media(tmp_path, "first.wav")
+        metrics.measure_loudness(first)
+
+        # Another worker process adds an entry behind this process's back
+        other = _media(tmp_path, "other.wav")
+        on_disk = json.loads(cache_path.read_text())
+        on_disk[metrics._cache_key(other, "true")] = {"id": metrics._file_id(other), "data": EBUR128_MEASUREMENTS}
+        cache_path.write_text(json.dumps(on_disk))
+
+        metrics.measure_loudness(_media(tmp_path, "second.wav"))
+
+        assert len(json.loads(cache_path.read_text())) == 3
+        metrics.measure_loudness(other)
+        assert mock_ffmpeg.call_count == 2
+
+    def test_persist_false_skips_cache(self, cache_path, mock_ffmpeg, tmp_path):
+        """Test that persist=False measures every time and writes nothing."""
+        path = _media(tmp_path, "out.wav")
+        metrics.measure_loudness(path, persist=False)
+        metrics.measure_loudness(path, persist=False)
+
+        assert mock_ffmpeg.call_count == 2
+        assert not os.path.exists(cache_path)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Unit tests for audio_engine.processor."""
+
+import logging
+import os
+import time
+import pytest
+from unittest.mock import patch
+
+from audio_engine import processor
+
+INPUT_STATS = {"input_i": "-27.6", "input_tp": "-4.5", "input_lra": "18.1", "input_thresh": "-39.2"}
+OUTPUT_STATS = {"output_i": "-16.02", "output_tp": "-1.50", "output_lra": "14.78", "output_thresh": "-27.71"}
+REMEASURED = {"input_i": "-16.1", "input_tp": "-1.6", "input_lra": "14.0", "input_thresh": "-26.5"}
+
+PRESET = {"algorithms": {"loudness": {"target_lufs": -16}}}
+
+
+def _fake_run_job(input_path, preset, output_dir):
+    """Module-level (picklable) run_job stand-in; later inputs finish first."""
+    time.sleep(0.05 * (3 - int(os.path.basename(input_path)[0])))
+    logging.getLogger("audio_engine.test").warning(f"done {input_path}")
+    return {"input": input_path, "output_dir": output_dir, "preset": preset, "pid": os.getpid()}
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "in.wav"
+    path.write_bytes(b"audio")
+    return str(path)
+
+
+class TestRunJob:
+    """Tests for run_job."""
+
+    def test_reuses_apply_pass_output_stats(self, input_file, tmp_path):
+        """Test that output_* stats from normalization skip the verification measurement."""
+        with patch.object(processor, "normalize_audio", return_value={**INPUT_STATS, **OUTPUT_STATS}), \
+             patch.object(processor, "measure_loudness") as mock_measure:
+            report = processor.run_job(input_file, PRESET, output_dir=str(tmp_path))
+
+        mock_measure.assert_not_called()
+        assert report["input"] == {"file": "in.wav", "measured": True, "lufs": -27.6, "true_peak": -4.5, "lra": 18.1}
+        assert report["output"]["lufs"] == -16.02
+        assert report["output"]["true_peak"] == -1.5
+        assert report["targets"] == {"lufs": -16.0, "true_peak": -2.0}
+
+    def test_remeasures_output_without_apply_stats(self, input_file, tmp_path):
+        """Test that the output is measured (uncached) when normalization reports no output_*."""
+        with patch.object(processor, "normalize_audio", return_value=dict(INPUT_STATS)), \
+             patch.object(processor, "measure_loudness", return_value=REMEASURED) as mock_measure:
+            report = processor.run_job(input_file, PRESET, output_dir=str(tmp_path))
+
+        mock_measure.assert_called_once_with(str(tmp_path / "processed_in.wav"), persist=False)
+        assert report["output"]["lufs"] == -16.1
+
+    def test_preset_options_reach_normalize_audio(self, input_file, tmp_path):
+        """Test the one_pass, fast_measure and peak settings passed to normalization."""
+        preset = {"algorithms": {"loudness": {
+            "target_lufs": -14, "peak_mode": "fixed", "true_peak_db": -1.5,
+            "one_pass": True, "fast_measure": True,
+        }}}
+        with patch.object(processor, "normalize_audio", return_value={**INPUT_STATS, **OUTPUT_STATS}) as mock_norm:
+            processor.run_job(input_file, preset, output_dir=str(tmp_path))
+
+        kwargs = mock_norm.call_args.kwargs
+        assert (kwargs["target_lufs"], kwargs["true_peak"]) == (-14.0, -1.5)
+        assert kwargs["one_pass"] is True
+        assert kwargs["fast_peak"] is True
+
+    def test_disabled_loudness_reports_unmeasured_input(self, input_file, tmp_path):
+        """Test that a disabled loudness step copies the file and doesn't measure the input."""
+        preset = {"algorithms": {"loudness": {"enabled": False}}}
+        with patch.object(processor, "normalize_audio") as mock_norm, \
+             patch.object(processor, "measure_loudness", return_value=REMEASURED) as mock_measure:
+            report = processor.run_job(input_file, preset, output_dir=str(tmp_path))
+
+        mock_norm.assert_not_called()
+        mock_measure.assert_called_once()
+        assert (tmp_path / "processed_in.wav").read_bytes() == b"audio"
+        assert report["input"] == {"file": "in.wav", "measured": False, "lufs": None, "true_peak": None, "lra": None}
+        assert report["output"]["lufs"] == -16.1
+
+
+class TestRunJobs:
+    """Tests for run_jobs."""
+
+    def test_results_in_input_order_with_separate_output_dirs(self, tmp_path, caplog):
+        """Test the process pool returns reports in input order, one fresh output dir per job."""
+        inputs = [str(tmp_path / f"{i}.wav") for i in range(3)]
+        (tmp_path / "output").mkdir()
+        with patch.object(processor, "OUTPUT_DIR", str(tmp_path / "output")), \
+             patch.object(processor, "run_job", _fake_run_job), \
+             caplog.at_level(logging.WARNING):
+            results = processor.run_jobs(inputs, PRESET)
+
+        assert [r["input"] for r in results] == inputs
+        assert all(r["preset"] == PRESET for r in results)
+        assert all(r["pid"] != os.getpid() for r in results)
+        output_dirs = [r["output_dir"] for r in results]
+        assert len(set(output_dirs)) == 3
+        for output_dir in output_dirs:
+            assert os.path.isdir(output_dir)
+            assert os.path.dirname(output_dir) == str(tmp_path / "output")
+        # Worker log records are forwarded to the parent's handlers
+        assert {f"done {path}" for path in inputs} <= {r.getMessage() for r in caplog.records}
@@ -1,39 +1,53 @@
 #!/usr/bin/env python3
 """Unit tests for AudioProcessorAgent."""
 
+import shutil
 import pytest
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
+from execution.agents.audio_processor import AudioProcessorAgent
+
 
 class TestAudioProcessorAgent:
     """Tests for AudioProcessorAgent."""
     
-    @pytest.fixture
+    CONFIG = {
+        "target_loudness_lufs": -16,
+        "highpass_hz": 80,
+        "lowpass_hz": 12000,
+        "compression_threshold_db": -20,
+        "compression_ratio": 3,
+    }
+    
+    @pytest.fixture(scope="module")
     def agent(self):
-        """Create agent with default config."""
-        from execution.agents.audio_processor import AudioProcessorAgent
-        return AudioProcessorAgent({
-            "target_loudness_lufs": -16,
-            "highpass_hz": 80,
-            "lowpass_hz": 12000,
-            "compression_threshold_db": -20,
-            "compression_ratio": 3,
-        })
+        """Create agent with default config, shared by the tests that only read it."""
+        return AudioProcessorAgent(dict(self.CONFIG))
+    
+    @pytest.fixture
+    def fresh_agent(self):
+        """Create a per-test agent for tests that change its config."""
+        return AudioProcessorAgent(dict(self.CONFIG))
     
     def test_build_filter_chain(self, agent):
         """Test FFmpeg filter chain generation."""
         chain = agent._build_filter_chain()
         
-        assert "highpass=f=80" in chain
-        assert "lowpass=f=12000" in chain
-        assert "loudnorm=I=-16" in chain
-        assert "acompressor" in chain
+        needles = ("highpass=f=80", "lowpass=f=12000", "loudnorm=I=-16", "acompressor")
+        missing = [n for n in needles if n not in chain]
+        assert not missing, f"missing: {missing}"
+    
+    def test_filter_chain_rebuilt_on_config_change(self, fresh_agent):
+        """Test that the memoized chain is reused until the config changes."""
+        chain = fresh_agent._build_filter_chain()
+        assert fresh_agent._build_filter_chain() is chain
+        
+        fresh_agent.config["highpass_hz"] = 120
+        assert "highpass=f=120" in fresh_agent._build_filter_chain()
     
     def test_filter_chain_uses_config_values(self):
         """Test that filter chain uses custom config values."""
-        from execution.agents.audio_processor import AudioProcessorAgent
-        
         agent = AudioProcessorAgent({
             "target_loudness_lufs": -14,
             "highpass_hz": 100,
@@ -41,57 +55,146 @@ class TestAudioProcessorAgent:
         })
         
         chain = agent._build_filter_chain()
-        assert "highpass=f=100" in chain
-        assert "lowpass=f=10000" in chain
-        assert "loudnorm=I=-14" in chain
+        needles = ("highpass=f=100", "lowpass=f=10000", "loudnorm=I=-14")
+        missing = [n for n in needles if n not in chain]
+        assert not missing, f"missing: {missing}"
     
-    @patch("subprocess.run")
-    def test_process_calls_ffmpeg(self, mock_run, agent, tmp_path):
+    @patch("subprocess.Popen")
+    def test_process_calls_ffmpeg(self, mock_popen, agent, tmp_path):
         """Test that process calls FFmpeg with correct arguments."""
         # Setup
         input_file = tmp_path / "input.mp4"
         input_file.touch()
         output_dir = tmp_path / "output"
-        output_dir.mkdir()
         
-        mock_run.return_value = MagicMock(returncode=0, stderr="")
+        mock_popen.return_value = MagicMock(returncode=0, stderr=[])
         
         # Mock output file creation
         def create_output(*args, **kwargs):
-            output_path = output_dir / "input_audio_normalized.wav"
+            output_path = output_dir / "input_audio_normalized.flac"
             output_path.touch()
-            return MagicMock(returncode=0, stderr="")
+            return MagicMock(returncode=0, stderr=[])
         
-        mock_run.side_effect = create_output
+        mock_popen.side_effect = create_output
         
         # Execute
         result = agent.process(str(input_file), str(output_dir))
         
         # Verify
-        assert mock_run.called
-        call_args = mock_run.call_args[0][0]
+        assert mock_popen.called
+        call_args = mock_popen.call_args[0][0]
         assert "ffmpeg" in call_args
     
-    def test_process_returns_correct_structure(self, agent, tmp_path):
-        """Test result dict structure."""
+    def test_output_dir_recreated_after_removal(self, fresh_agent, tmp_path):
+        """Test that a second run on the same agent re-creates a deleted output dir."""
         input_file = tmp_path / "input.mp4"
         input_file.touch()
         output_dir = tmp_path / "output"
         
-        with patch("subprocess.run") as mock_run:
+        with patch("subprocess.Popen") as mock_popen:
+            def create_output(*args, **kwargs):
+                (output_dir / "input_audio_normalized.flac").touch()
+                return MagicMock(returncode=0, stderr=[])
+            
+            mock_popen.side_effect = create_output
+            assert fresh_agent.process(str(input_file), str(output_dir))["success"] is True
+            shutil.rmtree(output_dir)
+            assert fresh_agent.process(str(input_file), str(output_dir))["success"] is True
+    
+    @pytest.fixture(scope="module")
+    def process_result(self, agent, tmp_path_factory):
+        """Run process() once with mocked ffmpeg; structure tests share the result."""
+        tmp_path = tmp_path_factory.mktemp("audio_process")
+        input_file = tmp_path / "input.mp4"
+        input_file.touch()
+        output_dir = tmp_path / "output"
+        
+        with patch("subprocess.Popen") as mock_popen:
             # Mock successful execution
             def create_output(*args, **kwargs):
-                output_dir.mkdir(exist_ok=True)
+                (output_dir / "input_audio_normalized.flac").touch()
+                return MagicMock(returncode=0, stderr=[])
+            
+            mock_popen.side_effect = create_output
+            return agent.process(str(input_file), str(output_dir))
+    
+    @pytest.mark.parametrize("key", ["success", "agent", "elapsed_time"])
+    def test_process_result_has_key(self, process_result, key):
+        """Test result dict structure."""
+        assert key in process_result
+    
+    def test_process_result_names_agent(self, process_result):
+        """Test the result reports which agent produced it."""
+        assert process_result["agent"] == "AudioProcessorAgent"
+    
+    def test_output_codec_pcm_writes_wav(self, tmp_path):
+        """Test that pcm_s16le output codec produces a WAV file."""
+        agent = AudioProcessorAgent({"output_codec": "pcm_s16le"})
+        input_file = tmp_path / "input.mp4"
+        input_file.touch()
+        output_dir = tmp_path / "output"
+        
+        with patch("subprocess.Popen") as mock_popen:
+            def create_output(*args, **kwargs):
                 (output_dir / "input_audio_normalized.wav").touch()
-                return MagicMock(returncode=0, stderr="")
+                return MagicMock(returncode=0, stderr=[])
             
-            mock_run.side_effect = create_output
+            mock_popen.side_effect = create_output
             result = agent.process(str(input_file), str(output_dir))
         
-        assert "success" in result
-        assert "agent" in result
-        assert "elapsed_time" in result
-        assert result["agent"] == "AudioProcessorAgent"
+        assert result["success"] is True
+        assert result["output_path"].endswith(".wav")
+        assert any("pcm_s16le" in call[0][0] for call in mock_popen.call_args_list)
+    
+    def test_loudness_stats_keep_stderr_tail(self, agent, tmp_path):
+        """Test that stats are parsed from the tail of a long stderr stream."""
+        stderr_lines = [b"frame log line\n"] * 10000 + [
+            b"[Parsed_ebur128_0 @ 0x1] Summary:\n",
+            b"  Integrated loudness:\n",
+            b"    I:         -19.6 LUFS\n",
+            b"    Threshold: -30.0 LUFS\n",
+            b"  Loudness range:\n",
+            b"    LRA:         4.2 LU\n",
+            b"  True peak:\n",
+            b"    Peak:       -1.2 dBFS\n",
+        ]
+        
+        with patch("subprocess.Popen") as mock_popen:
+            mock_popen.return_value = MagicMock(returncode=0, stderr=iter(stderr_lines))
+            stats = agent._get_loudness_stats(tmp_path / "input.mp4")
+        
+        assert stats == {"input_i": -19.6, "input_tp": -1.2, "input_lra": 4.2}
+    
+    def test_loudness_stats_include_input_duration(self, agent, tmp_path):
+        """Test that the input header's duration and video size are parsed from the same run."""
+        stderr_lines = [
+            b"Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'input.mp4':\n",
+            b"  Duration: 01:02:03.50, start: 0.000000, bitrate: 125 kb/s\n",
+            b"  Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), "
+            b"yuv420p(tv, bt709, progressive), 1920x1080 [SAR 1:1 DAR 16:9], 30 fps\n",
+        ]
+        
+        with patch("subprocess.Popen") as mock_popen:
+            mock_popen.return_value = MagicMock(returncode=0, stderr=iter(stderr_lines))
+            stats = agent._get_loudness_stats(tmp_path / "input.mp4")
+        
+        assert stats == {"duration": 3723.5, "video_size": [1920, 1080]}
+    
+    def test_run_ffmpeg_reports_progress(self, agent):
+        """Test that -progress output is parsed into millisecond callbacks."""
+        progress = []
+        
+        with patch("subprocess.Popen") as mock_popen:
+            mock_popen.return_value = MagicMock(
+                returncode=0,
+                stdout=["out_time_ms=1500000\n", "out_time_ms=N/A\n", "progress=end\n"],
+                stderr=[],
+            )
+            result = agent._run_ffmpeg(["ffmpeg", "-i", "in.mp4", "out.flac"], on_progress=progress.append)
+        
+        assert progress == [1500]
+        assert result.returncode == 0
+        assert mock_popen.call_args[0][0][:4] == ["ffmpeg", "-progress", "pipe:1", "-nostats"]
     
     def test_validates_input_file(self, agent, tmp_path):
         """Test that missing input file raises error."""
@@ -1,28 +1,63 @@
 #!/usr/bin/env python3
 """Unit tests for BackupManagerAgent."""
 
+import os
+import shutil
+import time
 import pytest
 from pathlib import Path
-from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from execution.agents.backup_manager import BackupManagerAgent
+
+
+@pytest.fixture(scope="module")
+def backup_template(tmp_path_factory):
+    """Build the file layout the backup tests start from, once per module."""
+    template = tmp_path_factory.mktemp("backup_template")
+    (template / "input.mp4").write_bytes(b"test content")
+    (template / "backup.mp4").write_bytes(b"backup content")
+    
+    backup_dir = template / ".backups"
+    backup_dir.mkdir()
+    (backup_dir / "new_backup.mp4").touch()
+    old_backup = backup_dir / "old_backup.mp4"
+    old_backup.touch()
+    # Ten days old; copytree's copy2 carries the mtime into each workspace
+    old_ts = time.time() - 10 * 86400
+    os.utime(old_backup, (old_ts, old_ts))
+    
+    return template
+
+
+@pytest.fixture
+def backup_workspace(backup_template, tmp_path):
+    """Per-test copy of the backup template."""
+    return Path(shutil.copytree(backup_template, tmp_path / "ws"))
 
 
 class TestBackupManagerAgent:
     """Tests for BackupManagerAgent."""
     
-    @pytest.fixture
+    CONFIG = {
+        "enabled": True,
+        "backup_dir": ".backups",
+        "retention_days": 7,
+    }
+    
+    @pytest.fixture(scope="module")
     def agent(self):
-        """Create agent with default config."""
-        from execution.agents.backup_manager import BackupManagerAgent
-        return BackupManagerAgent({
-            "enabled": True,
-            "backup_dir": ".backups",
-            "retention_days": 7,
-        })
+        """Create agent with default config, shared by the tests that only read it."""
+        return BackupManagerAgent(dict(self.CONFIG))
+    
+    @pytest.fixture
+    def fresh_agent(self):
+        """Create a per-test agent for tests that change its config."""
+        return BackupManagerAgent(dict(self.CONFIG))
     
     @pytest.fixture
     def disabled_agent(self):
         """Create disabled backup agent."""
-        from execution.agents.backup_manager import BackupManagerAgent
         return BackupManagerAgent({
             "enabled": False,
             "backup_dir": ".backups",
@@ -39,11 +74,17 @@ class TestBackupManagerAgent:
         # Should contain timestamp
         assert len(name) > len("video_.mp4")
     
-    def test_process_creates_backup(self, agent, tmp_path):
+    def test_generate_backup_name_unique_within_second(self, agent, tmp_path):
+        """Test that names generated in the same second don't collide."""
+        test_file = tmp_path / "video.mp4"
+        names = {agent._generate_backup_name(test_file) for _ in range(3)}
+        
+        assert len(names) == 3
+    
+    def test_process_creates_backup(self, agent, backup_workspace):
         """Test that backup is created."""
-        input_file = tmp_path / "input.mp4"
-        input_file.write_bytes(b"test content")
-        output_dir = tmp_path / "output"
+        input_file = backup_workspace / "input.mp4"
+        output_dir = backup_workspace / "output"
         
         result = agent.process(str(input_file), str(output_dir))
         
@@ -52,6 +93,48 @@ class TestBackupManagerAgent:
         assert result["backup_path"] is not None
         assert Path(result["backup_path"]).exists()
     
+    def test_backup_preserves_content_and_mtime(self, agent, backup_workspace):
+        """Test that the fast copy path matches copy2 semantics."""
+        input_file = backup_workspace / "input.mp4"
+        output_dir = backup_workspace / "output"
+        
+        result = agent.process(str(input_file), str(output_dir))
+        backup = Path(result["backup_path"])
+        
+        assert result["backup_method"] in ("reflink", "hardlink", "copy")
+        assert backup.read_bytes() == b"test content"
+        assert backup.stat().st_mtime == input_file.stat().st_mtime
+    
+    @pytest.mark.parametrize("allow_hardlink, method", [(None, "copy"), (True, "hardlink")])
+    def test_hardlink_is_opt_in(self, fresh_agent, backup_workspace, allow_hardlink, method):
+        """Test that without reflink the backup is a separate copy unless hardlinks are enabled."""
+        input_file = backup_workspace / "input.mp4"
+        output_dir = backup_workspace / "output"
+        if allow_hardlink is not None:
+            fresh_agent.config["allow_hardlink"] = allow_hardlink
+        
+        with patch("execution.agents.backup_manager.fcntl", None):
+            result = fresh_agent.process(str(input_file), str(output_dir))
+        
+        backup = Path(result["backup_path"])
+        assert result["backup_method"] == method
+        assert backup.samefile(input_file) is (method == "hardlink")
+    
+    def test_name_collision_never_truncates_existing_backup(self, fresh_agent, backup_workspace):
+        """Test that a backup name taken by a hardlink to the input is skipped, not overwritten."""
+        input_file = backup_workspace / "input.mp4"
+        output_dir = backup_workspace / "output"
+        backup_dir = output_dir / ".backups"
+        backup_dir.mkdir(parents=True)
+        os.link(input_file, backup_dir / "taken.mp4")
+        
+        with patch.object(fresh_agent, "_generate_backup_name", side_effect=["taken.mp4", "free.mp4"]):
+            result = fresh_agent.process(str(input_file), str(output_dir))
+        
+        assert Path(result["backup_path"]).name == "free.mp4"
+        assert input_file.read_bytes() == b"test content"
+        assert (backup_dir / "taken.mp4").read_bytes() == b"test content"
+    
     def test_process_disabled_skips_backup(self, disabled_agent, tmp_path):
         """Test that disabled agent skips backup."""
         input_file = tmp_path / "input.mp4"
@@ -62,36 +145,25 @@ class TestBackupManagerAgent:
         
         assert result["backup_path"] is None
     
-    def test_cloud_upload_stub(self, agent, tmp_path):
+    def test_cloud_upload_stub(self, fresh_agent, tmp_path):
         """Test cloud upload stub."""
-        agent.config["upload_to_drive"] = True
+        fresh_agent.config["upload_to_drive"] = True
         input_file = tmp_path / "test.txt"
         input_file.write_text("content")
         
         # Mock folder setup
         output_dir = tmp_path / "output"
         
-        result = agent.process(str(input_file), str(output_dir))
+        result = fresh_agent.process(str(input_file), str(output_dir))
         
         assert result["cloud_upload"] == "mock_success_id_12345"
     
-    def test_cleanup_old_backups(self, agent, tmp_path):
+    def test_cleanup_old_backups(self, agent, backup_workspace):
         """Test that old backups are cleaned up."""
-        backup_dir = tmp_path / ".backups"
-        backup_dir.mkdir()
-        
-        # Create old backup (simulate with file mtime)
+        # The template holds one 10-day-old and one recent backup
+        backup_dir = backup_workspace / ".backups"
         old_backup = backup_dir / "old_backup.mp4"
-        old_backup.touch()
-        
-        # Create recent backup
         new_backup = backup_dir / "new_backup.mp4"
-        new_backup.touch()
-        
-        # Set old backup mtime to 10 days ago
-        import os
-        old_time = datetime.now() - timedelta(days=10)
-        os.utime(old_backup, (old_time.timestamp(), old_time.timestamp()))
         
         cleaned = agent._cleanup_old_backups(backup_dir)
         
@@ -99,11 +171,10 @@ class TestBackupManagerAgent:
         assert not old_backup.exists()
         assert new_backup.exists()
     
-    def test_restore(self, agent, tmp_path):
+    def test_restore(self, agent, backup_workspace):
         """Test backup restoration."""
-        backup_file = tmp_path / "backup.mp4"
-        backup_file.write_bytes(b"backup content")
-        restore_path = tmp_path / "restored.mp4"
+        backup_file = backup_workspace / "backup.mp4"
+        restore_path = backup_workspace / "restored.mp4"
         
         result = agent.restore(str(backup_file), str(restore_path))
         
@@ -1,30 +1,49 @@
 #!/usr/bin/env python3
 """Unit tests for CaptionGeneratorAgent."""
 
+import sys
 import pytest
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
+from execution.agents import caption_generator
+from execution.agents.caption_generator import CaptionGeneratorAgent
+
+# Result of a mocked subprocess.run; the agent only reads returncode/stdout/stderr
+_OK = SimpleNamespace(returncode=0, stdout=b"", stderr=b"")
+
 
 class TestCaptionGeneratorAgent:
     """Tests for CaptionGeneratorAgent."""
     
-    @pytest.fixture
+    CONFIG = {
+        "whisper_model": "tiny",
+        "language": "en",
+        "max_words_per_line": 10,
+        "max_chars_per_line": 42,
+    }
+    
+    @pytest.fixture(scope="module")
     def agent(self):
-        """Create agent with default config."""
-        from execution.agents.caption_generator import CaptionGeneratorAgent
-        return CaptionGeneratorAgent({
-            "whisper_model": "tiny",
-            "language": "en",
-            "max_words_per_line": 10,
-            "max_chars_per_line": 42,
-        })
-    
-    def test_format_timestamp(self, agent):
+        """Create agent with default config, shared by the tests that only read it."""
+        return CaptionGeneratorAgent(dict(self.CONFIG))
+    
+    @pytest.fixture
+    def fresh_agent(self):
+        """Create a per-test agent for tests that change its config."""
+        return CaptionGeneratorAgent(dict(self.CONFIG))
+    
+    @pytest.mark.parametrize("seconds, expected", [
+        (0, "00:00:00,000"),
+        (61.5, "00:01:01,500"),
+        (3661.123, "01:01:01,123"),
+        (1.001, "00:00:01,001"),
+        (59.9996, "00:01:00,000"),
+    ])
+    def test_format_timestamp(self, agent, seconds, expected):
         """Test SRT timestamp formatting."""
-        assert agent._format_timestamp(0) == "00:00:00,000"
-        assert agent._format_timestamp(61.5) == "00:01:01,500"
-        assert agent._format_timestamp(3661.123) == "01:01:01,123"
+        assert agent._format_timestamp(seconds) == expected
     
     def test_segment_to_srt_lines_respects_word_limit(self, agent):
         """Test that segments are split by word count."""
@@ -68,41 +87,77 @@ class TestCaptionGeneratorAgent:
         assert len(lines) == 1
         assert lines[0] == (0, 5, "Hello world")
     
-    def test_process_returns_correct_structure(self, agent, tmp_path):
-        """Test result dict structure."""
+    def test_generate_srt_numbers_entries_across_segments(self, agent, tmp_path):
+        """Test that SRT entries are numbered continuously across segments."""
+        srt_path = tmp_path / "out.srt"
+        segments = [
+            {"start": 0, "end": 2, "text": "Hello world"},
+            {"start": 2, "end": 3.5, "text": "Again"},
+        ]
+        
+        stats = agent._generate_srt(segments, srt_path)
+        
+        assert stats == {"entry_count": 2, "word_count": 3, "duration": 3.5}
+        assert srt_path.read_text(encoding="utf-8") == (
+            "1\n00:00:00,000 --> 00:00:02,000\nHello world\n\n"
+            "2\n00:00:02,000 --> 00:00:03,500\nAgain\n\n"
+        )
+    
+    @pytest.fixture(scope="module")
+    def process_result(self, agent, tmp_path_factory):
+        """Run process() once with mocked ffmpeg and Whisper; structure tests share the result."""
+        tmp_path = tmp_path_factory.mktemp("caption_process")
         input_file = tmp_path / "input.mp4"
         input_file.touch()
         output_dir = tmp_path / "output"
         
-        with patch("subprocess.run") as mock_run, \
+        with pytest.MonkeyPatch.context() as mp, \
+             patch("subprocess.run") as mock_run, \
              patch.object(agent, "_transcribe") as mock_transcribe:
+            # Module-scoped, so conftest's function-scoped cache isolation isn't active yet
+            mp.setattr(caption_generator, "TRANSCRIPTION_CACHE_DIR", tmp_path / "whisper_cache")
             
-            mock_run.return_value = MagicMock(returncode=0)
+            mock_run.return_value = _OK
             mock_transcribe.return_value = [
                 {"start": 0, "end": 2, "text": "Hello world", "words": []}
             ]
             
-            output_dir.mkdir(exist_ok=True)
-            result = agent.process(str(input_file), str(output_dir))
-        
-        assert "success" in result
-        assert "agent" in result
-        assert result["agent"] == "CaptionGeneratorAgent"
+            return agent.process(str(input_file), str(output_dir))
+    
+    @pytest.mark.parametrize("key", ["success", "agent"])
+    def test_process_result_has_key(self, process_result, key):
+        """Test result dict structure."""
+        assert key in process_result
+    
+    def test_process_result_names_agent(self, process_result):
+        """Test the result reports which agent produced it."""
+        assert process_result["agent"] == "CaptionGeneratorAgent"
 
-    def test_burn_captions(self, agent, tmp_path):
+    def test_extract_audio_pipes_pcm(self, agent, tmp_path):
+        """Test audio is read from ffmpeg's stdout rather than a temp file."""
+        with patch("subprocess.run") as mock_run:
+            mock_run.return_value = SimpleNamespace(returncode=0, stdout=b"\x01\x00" * 4, stderr=b"")
+            
+            audio = agent._extract_audio(tmp_path / "input.mp4")
+        
+        cmd = mock_run.call_args[0][0]
+        assert cmd[-1] == "pipe:1"
+        assert cmd[cmd.index("-f") + 1] == "s16le"
+        assert audio == b"\x01\x00" * 4
+    
+    def test_burn_captions(self, fresh_agent, tmp_path):
         """Test burn_captions flag triggers ffmpeg call."""
-        agent.config["burn_captions"] = True
+        fresh_agent.config["burn_captions"] = True
         input_file = tmp_path / "input.mp4"
         input_file.touch()
         output_dir = tmp_path / "output"
-        output_dir.mkdir()
         
         with patch("subprocess.run") as mock_run, \
-             patch.object(agent, "_transcribe", return_value=[]):
+             patch.object(fresh_agent, "_transcribe", return_value=[]):
             
-            mock_run.return_value = MagicMock(returncode=0)
+            mock_run.return_value = _OK
             
-            result = agent.process(str(input_file), str(output_dir))
+            result = fresh_agent.process(str(input_file), str(output_dir))
             
             # Should have called ffmpeg for audio, then burn
             # We expect at least one call with "subtitles=" in args
@@ -115,3 +170,156 @@ class TestCaptionGeneratorAgent:
             
             assert burn_call_found
             assert "burned_video_path" in result
+    
+    def test_transcription_cache_hit(self, fresh_agent, tmp_path):
+        """Test identical audio is transcribed only once."""
+        fresh_agent.config["transcription_cache_dir"] = str(tmp_path / "cache")
+        audio = b"\x00\x01" * 64
+        segments = [{"start": 0, "end": 2, "text": "Hello world", "words": []}]
+        
+        with patch.object(fresh_agent, "_transcribe", return_value=segments) as mock_transcribe:
+            assert fresh_agent._transcribe_cached(audio) == segments
+            assert fresh_agent._transcribe_cached(audio) == segments
+            
+            fresh_agent.config["language"] = "de"
+            fresh_agent._transcribe_cached(audio)
+            
+            fresh_agent.config["device"] = "cuda"
+            fresh_agent._transcribe_cached(audio)
+        
+        # Second call hits the cache; a different language or device is a new key
+        assert mock_transcribe.call_count == 3
+    
+    def test_transcription_cache_key_uses_resolved_device(self):
+        """Test that an unset device is keyed by what it resolves to (CUDA vs CPU)."""
+        audio = b"\x00\x01" * 64
+        cpu_key = CaptionGeneratorAgent(dict(self.CONFIG))._transcription_cache_key(audio)
+        
+        with patch.object(sys.modules["torch"].cuda, "is_available", return_value=True):
+            cuda_key = CaptionGeneratorAgent(dict(self.CONFIG))._transcription_cache_key(audio)
+        
+        assert cpu_key != cuda_key
+    
+    def test_device_resolved_once(self, fresh_agent):
+        """Test that repeated cache-key lookups don't query CUDA again."""
+        audio = b"\x00\x01" * 64
+        with patch.object(sys.modules["torch"].cuda, "is_available", return_value=False) as mock_available:
+            fresh_agent._transcription_cache_key(audio)
+            fresh_agent._transcription_cache_key(audio)
+        
+        assert mock_available.call_count == 1
+    
+    def test_api_words_bucketed_by_segment(self, agent):
+        """Test API words are assigned to the segment they start in."""
+        segments = [
+            MagicMock(start=0.0, end=2.0, text=" Hello there."),
+            {"start": 2.0, "end": 4.0, "text": " General Kenobi."},
+        ]
+        words = [
+            MagicMock(start=0.0, end=0.5, word="Hello"),
+            MagicMock(start=0.6, end=1.0, word="there."),
+            {"start": 2.1, "end": 2.8, "word": "General"},
+            {"start": 3.9, "end": 4.2, "word": "Kenobi."},
+        ]
+        
+        result = agent._bucket_api_words(segments, words)
+        
+        assert [w["word"] for w in result[0]["words"]] == ["Hello", "there."]
+        assert [w["word"] for w in result[1]["words"]] == ["General", "Kenobi."]
+        assert result[1]["text"] == " General Kenobi."
+    
+    def test_local_model_loaded_once(self, agent, tmp_path):
+        """Test that the Whisper model is reused across transcriptions."""
+        fake_whisper = MagicMock()
+        fake_whisper.load_model.return_value.transcribe.return_value = {"segments": []}
+        
+        with patch.dict(sys.modules, {"whisper": fake_whisper}), \
+             patch.dict(caption_generator._WHISPER_MODEL_CACHE, clear=True), \
+             patch.object(caption_generator, "_pcm_to_float32"):
+            agent._transcribe_local(b"")
+            agent._transcribe_local(b"")
+        
+        assert fake_whisper.load_model.call_count == 1
+    
+    def test_local_model_fp16_on_cuda(self, fresh_agent):
+        """Test that on CUDA the model is halved with LayerNorm kept in fp32."""
+        class LayerNorm:
+            float = MagicMock()
+        
+        layer_norm, linear = LayerNorm(), MagicMock()
+        fake_whisper = MagicMock()
+        fake_whisper.model.LayerNorm = LayerNorm
+        model = fake_whisper.load_model.return_value
+        model.modules.return_value = [layer_norm, linear]
+        model.transcribe.return_value = {"segments": []}
+        fake_torch = MagicMock()
+        fake_torch.cuda.is_available.return_value = True
+        
+        with patch.dict(sys.modules, {"whisper": fake_whisper, "torch": fake_torch}), \
+             patch.dict(caption_generator._WHISPER_MODEL_CACHE, clear=True), \
+             patch.object(caption_generator, "_pcm_to_float32"):
+            fresh_agent._transcribe_local(b"")
+        
+        fake_whisper.load_model.assert_called_once_with("tiny", device="cuda:0")
+        model.half.assert_called_once()
+        LayerNorm.float.assert_called_once()
+        linear.float.assert_not_called()
+        assert model.transcribe.call_args.kwargs["fp16"] is True
+        fake_torch.no_grad.assert_called_once()
+    
+    def test_faster_whisper_segments_normalized(self, fresh_agent, tmp_path):
+        """Test that faster-whisper namedtuples are converted to segment dicts."""
+        word = MagicMock(start=0.0, end=0.5, word=" Hello")
+        segment = MagicMock(start=0.0, end=1.0, text=" Hello", words=[word])
+        fake_faster_whisper = MagicMock()
+        fake_faster_whisper.WhisperModel.return_value.transcribe.return_value = (iter([segment]), None)
+        fake_ctranslate2 = MagicMock()
+        fake_ctranslate2.get_cuda_device_count.return_value = 0
+        
+        fresh_agent.config["backend"] = "faster-whisper"
+        with patch.dict(sys.modules, {"faster_whisper": fake_faster_whisper, "ctranslate2": fake_ctranslate2}), \
+             patch.dict(caption_generator._WHISPER_MODEL_CACHE, clear=True), \
+             patch.object(caption_generator, "_pcm_to_float32"):
+            segments = fresh_agent._transcribe_local(b"")
+        
+        assert segments == [{
+            "start": 0.0, "end": 1.0, "text": " Hello",
+            "words": [{"start": 0.0, "end": 0.5, "word": " Hello"}]
+        }]
+        fake_faster_whisper.WhisperModel.assert_called_once_with(
+            "tiny", device="cpu", device_index=0, compute_type="int8"
+        )
+    
+    def test_faster_whisper_int8_float16_on_cuda(self, fresh_agent):
+        """Test CUDA defaults to int8 weights with fp16 activations and honors model_path."""
+        fake_faster_whisper = MagicMock()
+        fake_faster_whisper.WhisperModel.return_value.transcribe.return_value = (iter([]), None)
+        fake_ctranslate2 = MagicMock()
+        fake_ctranslate2.get_cuda_device_count.return_value = 1
+        
+        fresh_agent.config["backend"] = "faster-whisper"
+        fresh_agent.config["model_path"] = "models/whisper-tiny-int8"
+        with patch.dict(sys.modules, {"faster_whisper": fake_faster_whisper, "ctranslate2": fake_ctranslate2}), \
+             patch.dict(caption_generator._WHISPER_MODEL_CACHE, clear=True), \
+             patch.object(caption_generator, "_pcm_to_float32"):
+            fresh_agent._transcribe_local(b"")
+        
+        fake_faster_whisper.WhisperModel.assert_called_once_with(
+            "models/whisper-tiny-int8", device="cuda", device_index=0, compute_type="int8_float16"
+        )
+    
+    def test_faster_whisper_indexed_cuda_device(self, fresh_agent):
+        """Test that "cuda:1" is passed as device + device_index and still defaults to int8_float16."""
+        fake_faster_whisper = MagicMock()
+        fake_faster_whisper.WhisperModel.return_value.transcribe.return_value = (iter([]), None)
+        
+        fresh_agent.config["backend"] = "faster-whisper"
+        fresh_agent.config["device"] = "cuda:1"
+        with patch.dict(sys.modules, {"faster_whisper": fake_faster_whisper, "ctranslate2": MagicMock()}), \
+             patch.dict(caption_generator._WHISPER_MODEL_CACHE, clear=True), \
+             patch.object(caption_generator, "_pcm_to_float32"):
+            fresh_agent._transcribe_local(b"")
+        
+        fake_faster_whisper.WhisperModel.assert_called_once_with(
+            "tiny", device="cuda", device_index=1, compute_type="int8_float16"
+        )
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Unit tests for server.job_runner."""
+
+import asyncio
+import io
+import os
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+
+pytest.importorskip("fastapi")
+
+from server import job_runner
+
+
+def test_concurrent_uploads_with_same_filename(tmp_path):
+    """Test that two in-flight jobs for the same filename keep separate inputs and outputs."""
+    (tmp_path / "temp").mkdir()
+    (tmp_path / "output").mkdir()
+    both_running = threading.Barrier(2, timeout=5)
+    
+    def fake_run_job(input_path, preset, output_dir):
+        # Both uploads are saved before either job reads its input
+        both_running.wait()
+        with open(input_path, "rb") as f:
+            data = f.read()
+        output_path = os.path.join(output_dir, f"processed_{os.path.basename(input_path)}")
+        with open(output_path, "wb") as f:
+            f.write(data)
+        return {"output": {"path": output_path}}
+    
+    async def upload_both():
+        uploads = [
+            SimpleNamespace(filename="take.wav", file=io.BytesIO(b"first")),
+            SimpleNamespace(filename="take.wav", file=io.BytesIO(b"second")),
+        ]
+        return await asyncio.gather(*(job_runner.process_upload(u, "{}") for u in uploads))
+    
+    with ThreadPoolExecutor(max_workers=2) as pool, \
+         patch.object(job_runner, "_job_pool", pool), \
+         patch.object(job_runner, "TEMP_DIR", str(tmp_path / "temp")), \
+         patch.object(job_runner, "OUTPUT_DIR", str(tmp_path / "output")), \
+         patch.object(job_runner, "run_job", fake_run_job):
+        reports = asyncio.run(upload_both())
+    
+    output_paths = [r["output"]["path"] for r in reports]
+    assert output_paths[0] != output_paths[1]
+    assert [open(p, "rb").read() for p in output_paths] == [b"first", b"second"]
@@ -3,76 +3,128 @@
 
 import pytest
 import json
-from pathlib import Path
+import subprocess
 import sys
+from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
-# Mock whisper module before it's imported by anything
-mock_whisper = MagicMock()
-sys.modules["whisper"] = mock_whisper
+from agents import caption_generator as pipeline_caption_generator
+from execution.agents import caption_generator
+from execution.antigravity_pipeline import (
+    VideoPipelineOrchestrator,
+    _get_validator,
+    _load_config_cached,
+)
 
-import shutil
+# Minimal config that passes schema validation
+_VALID_CONFIG = {
+    "version": "1.0.0",
+    "audio": {
+        "target_loudness_lufs": -16,
+        "highpass_hz": 80,
+        "lowpass_hz": 12000,
+        "compression_threshold_db": -20,
+        "compression_ratio": 3,
+    },
+    "captions": {
+        "whisper_model": "tiny",
+        "language": "en",
+        "max_words_per_line": 10,
+    },
+    "video": {
+        "lut_path": None,
+        "output_codec": "h264",
+        "crf": 18,
+        "hardware_acceleration": False,
+        "software_encoder": "libx264",
+    },
+    "thumbnails": {
+        "count": 6,
+        "width": 1280,
+        "height": 720,
+        "format": "jpg",
+        "quality": 95,
+    },
+    "backup": {
+        "enabled": True,
+        "backup_dir": ".backups",
+        "retention_days": 7,
+    },
+    "logging": {
+        "output_dir": "logs",
+        "log_level": "INFO",
+        "persist_json": True,
+    },
+    "pipeline": {
+        "temp_dir": ".tmp",
+        "cleanup_temp": True,
+        "fail_fast": False,
+    }
+}
 
+# Stands in for every subprocess.run result in the mocked pipeline run
+_PIPELINE_MOCK_RETURN = SimpleNamespace(returncode=0, stdout="10.0", stderr="")
+# Popen results are iterated and waited on, so they stay mocks
+_PIPELINE_POPEN_RETURN = MagicMock(returncode=0, stdout="10.0", stderr="")
 
-class TestPipelineE2E:
-    """End-to-end tests for VideoPipelineOrchestrator."""
+
+def _mock_pipeline_run(cmd, *args, **kwargs):
+    """subprocess.run stand-in; writes the frames of the single-pass thumbnail extraction."""
+    if cmd[-1].endswith("thumb_%02d.jpg"):
+        for i in range(1, 7):
+            Path(cmd[-1].replace("%02d", f"{i:02d}")).touch()
+    return _PIPELINE_MOCK_RETURN
+
+
+def _materialize_pipeline_outputs(output_dir: Path) -> None:
+    """Create the files each agent expects its (mocked) ffmpeg run to produce."""
+    output_dir.mkdir(parents=True)
+    (output_dir / "test_audio_normalized.flac").touch()
+    (output_dir / "test_captions.srt").write_text("1\n00:00:00,000 --> 00:00:01,000\nTest\n\n")
+    (output_dir / "test_enhanced.mp4").touch()
+    (output_dir / ".backups").mkdir()
+    (output_dir / ".backups" / "test_backup.mp4").write_bytes(b"")
+
+
+@pytest.fixture(scope="module")
+def orchestrator():
+    """Create orchestrator with test config (shared by the module's tests)."""
+    return VideoPipelineOrchestrator(config=_VALID_CONFIG)
+
+
+@pytest.fixture(scope="module")
+def pipeline_result(orchestrator, tmp_path_factory):
+    """Run the mocked pipeline once; tests inspect its result dict."""
+    tmp_path = tmp_path_factory.mktemp("pipeline")
+    video = tmp_path / "test.mp4"
+    video.touch()
+    output_dir = tmp_path / "output"
     
-    @pytest.fixture
-    def orchestrator(self, tmp_path):
-        """Create orchestrator with test config."""
-        from execution.antigravity_pipeline import VideoPipelineOrchestrator
-        
-        # Create test config
-        config = {
-            "version": "1.0.0",
-            "audio": {
-                "target_loudness_lufs": -16,
-                "highpass_hz": 80,
-                "lowpass_hz": 12000,
-                "compression_threshold_db": -20,
-                "compression_ratio": 3,
-            },
-            "captions": {
-                "whisper_model": "tiny",
-                "language": "en",
-                "max_words_per_line": 10,
-            },
-            "video": {
-                "lut_path": None,
-                "output_codec": "h264",
-                "crf": 18,
-                "hardware_acceleration": False,
-                "software_encoder": "libx264",
-            },
-            "thumbnails": {
-                "count": 6,
-                "width": 1280,
-                "height": 720,
-                "format": "jpg",
-                "quality": 95,
-            },
-            "backup": {
-                "enabled": True,
-                "backup_dir": ".backups",
-                "retention_days": 7,
-            },
-            "logging": {
-                "output_dir": "logs",
-                "log_level": "INFO",
-                "persist_json": True,
-            },
-            "pipeline": {
-                "temp_dir": ".tmp",
-                "cleanup_temp": True,
-                "fail_fast": False,
-            }
-        }
+    with pytest.MonkeyPatch.context() as mp, \
+         patch("subprocess.run") as mock_run, \
+         patch("subprocess.Popen") as mock_popen:
+        # Module-scoped, so the function-scoped cache isolation in conftest doesn't apply yet
+        for module in (caption_generator, pipeline_caption_generator):
+            mp.setattr(module, "TRANSCRIPTION_CACHE_DIR", tmp_path / "whisper_cache")
         
-        config_path = tmp_path / "test_config.json"
-        with open(config_path, "w") as f:
-            json.dump(config, f)
+        # Outputs exist up front; of the mocked ffmpeg calls only thumbnail extraction writes files
+        _materialize_pipeline_outputs(output_dir)
+        mock_run.side_effect = _mock_pipeline_run
+        mock_popen.return_value = _PIPELINE_POPEN_RETURN
         
-        return VideoPipelineOrchestrator(config_path=str(config_path))
+        with patch("whisper.load_model") as mock_whisper:
+            mock_model = MagicMock()
+            mock_model.transcribe.return_value = {
+                "segments": [{"start": 0, "end": 1, "text": "Test", "words": []}]
+            }
+            mock_whisper.return_value = mock_model
+            
+            return orchestrator.process(str(video), output_dir=str(output_dir))
+
+
+class TestPipelineE2E:
+    """End-to-end tests for VideoPipelineOrchestrator."""
     
     def test_orchestrator_initialization(self, orchestrator):
         """Test that orchestrator initializes correctly."""
@@ -101,106 +153,208 @@ class TestPipelineE2E:
         
         assert result["checks"]["video_exists"] is False
         assert result["all_passed"] is False
-    
-    def test_process_returns_expected_structure(self, orchestrator, tmp_path):
+
+    def test_ffmpeg_check_cached(self, orchestrator):
+        """Test that ffmpeg -version is only spawned once per process."""
+        with patch("execution.antigravity_pipeline._ffmpeg_found", False), \
+             patch("subprocess.run") as mock_run:
+            assert orchestrator._check_ffmpeg() is True
+            assert orchestrator._check_ffmpeg() is True
+
+        assert mock_run.call_count == 1
+
+    def test_ffmpeg_check_failure_not_cached(self, orchestrator):
+        """Test that a timed-out ffmpeg probe is retried instead of reported missing for good."""
+        with patch("execution.antigravity_pipeline._ffmpeg_found", False), \
+             patch("subprocess.run") as mock_run:
+            mock_run.side_effect = [subprocess.TimeoutExpired("ffmpeg", 5), _PIPELINE_MOCK_RETURN]
+            assert orchestrator._check_ffmpeg() is False
+            assert orchestrator._check_ffmpeg() is True
+
+        assert mock_run.call_count == 2
+
+    @pytest.mark.parametrize("key", [
+        "final_video_path",
+        "captions_srt_path",
+        "thumbnail_paths",
+        "processing_log_path",
+        "total_time",
+        "error_messages",
+    ])
+    def test_process_result_has_key(self, pipeline_result, key):
         """Test that process returns all required keys."""
+        assert key in pipeline_result
+    
+    @pytest.mark.parametrize("key, expected_type", [
+        ("thumbnail_paths", list),
+        ("error_messages", list),
+        ("total_time", float),
+    ])
+    def test_process_result_types(self, pipeline_result, key, expected_type):
+        """Test the types of the result values."""
+        assert isinstance(pipeline_result[key], expected_type)
+    
+    def test_parallel_phases_feed_video_enhancement(self, orchestrator, tmp_path):
+        """Test parallel mode runs every phase and merges the audio output."""
         video = tmp_path / "test.mp4"
         video.touch()
         output_dir = tmp_path / "output"
         
-        # Mock all agent processes
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(returncode=0, stdout="10.0", stderr="")
-            
-            # Create expected output files
-            def setup_outputs(*args, **kwargs):
-                output_dir.mkdir(parents=True, exist_ok=True)
-                (output_dir / "test_audio_normalized.wav").touch()
-                (output_dir / "test_captions.srt").write_text("1\n00:00:00,000 --> 00:00:01,000\nTest\n\n")
-                (output_dir / "test_enhanced.mp4").touch()
-                thumb_dir = output_dir / "thumbnails"
-                thumb_dir.mkdir(exist_ok=True)
-                for i in range(1, 7):
-                    (thumb_dir / f"thumb_{i:02d}.jpg").touch()
-                (output_dir / ".backups").mkdir(exist_ok=True)
-                shutil.copy(video, output_dir / ".backups" / "test_backup.mp4")
-                return MagicMock(returncode=0, stdout="10.0", stderr="")
-            
-            mock_run.side_effect = setup_outputs
-            
-            with patch("whisper.load_model") as mock_whisper:
-                mock_model = MagicMock()
-                mock_model.transcribe.return_value = {
-                    "segments": [{"start": 0, "end": 1, "text": "Test", "words": []}]
-                }
-                mock_whisper.return_value = mock_model
-                
-                result = orchestrator.process(str(video), output_dir=str(output_dir))
-        
-        # Check required keys
-        assert "final_video_path" in result
-        assert "captions_srt_path" in result
-        assert "thumbnail_paths" in result
-        assert "processing_log_path" in result
-        assert "total_time" in result
-        assert "error_messages" in result
-        
-        # Check types
-        assert isinstance(result["thumbnail_paths"], list)
-        assert isinstance(result["error_messages"], list)
-        assert isinstance(result["total_time"], float)
-    
-    def test_processing_log_created(self, orchestrator, tmp_path):
-        """Test that JSON processing log is created."""
+        agents = {
+            name: MagicMock(config={}, **{"process.return_value": {"success": True, "agent": name}})
+            for name in ("backup", "audio", "captions", "video", "thumbnails")
+        }
+        agents["audio"].process.return_value["output_path"] = str(tmp_path / "audio.flac")
+        agents["video"].process.return_value = {"success": True}
+        
+        with patch.object(orchestrator, "_create_agents", return_value=agents):
+            result = orchestrator.process(
+                str(video), output_dir=str(output_dir),
+                config_overrides={"pipeline": {"parallel": True}}
+            )
+        
+        assert result["error_messages"] == []
+        for agent in agents.values():
+            agent.process.assert_called_once()
+        assert agents["video"].process.call_args.kwargs == {"external_audio_path": str(tmp_path / "audio.flac")}
+    
+    def test_audio_probe_passed_to_thumbnails(self, orchestrator, tmp_path):
+        """Test serial mode hands the audio phase's duration/size to thumbnails per call."""
         video = tmp_path / "test.mp4"
         video.touch()
-        output_dir = tmp_path / "output"
         
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(returncode=0, stdout="10.0", stderr="")
-            
-            def setup_outputs(*args, **kwargs):
-                output_dir.mkdir(parents=True, exist_ok=True)
-                (output_dir / "test_audio_normalized.wav").touch()
-                (output_dir / "test_captions.srt").write_text("1\n00:00:00,000 --> 00:00:01,000\nTest\n\n")
-                (output_dir / "test_enhanced.mp4").touch()
-                thumb_dir = output_dir / "thumbnails"
-                thumb_dir.mkdir(exist_ok=True)
-                for i in range(1, 7):
-                    (thumb_dir / f"thumb_{i:02d}.jpg").touch()
-                (output_dir / ".backups").mkdir(exist_ok=True)
-                shutil.copy(video, output_dir / ".backups" / "test_backup.mp4")
-                return MagicMock(returncode=0, stdout="10.0", stderr="")
-            
-            mock_run.side_effect = setup_outputs
-            
-            with patch("whisper.load_model") as mock_whisper:
-                mock_model = MagicMock()
-                mock_model.transcribe.return_value = {
-                    "segments": [{"start": 0, "end": 1, "text": "Test", "words": []}]
-                }
-                mock_whisper.return_value = mock_model
-                
-                result = orchestrator.process(str(video), output_dir=str(output_dir))
-        
-        log_path = Path(result["processing_log_path"])
-        assert log_path.exists()
-        
-        with open(log_path) as f:
+        agents = {
+            name: MagicMock(config={}, **{"process.return_value": {"success": True}})
+            for name in ("backup", "audio", "captions", "video", "thumbnails")
+        }
+        agents["audio"].process.return_value.update(input_duration=12.5, input_video_size=[1920, 1080])
+        
+        with patch.object(orchestrator, "_create_agents", return_value=agents):
+            orchestrator.process(str(video), output_dir=str(tmp_path / "output"))
+        
+        assert agents["thumbnails"].process.call_args.kwargs == {
+            "video_duration": 12.5, "video_size": [1920, 1080]
+        }
+        assert agents["thumbnails"].config == {}
+    
+    def test_processing_log_created(self, pipeline_result):
+        """Test that JSON processing log is created."""
+        assert Path(pipeline_result["processing_log_path"]).exists()
+    
+    @pytest.mark.parametrize("key", ["timestamp", "total_time_seconds", "agent_results"])
+    def test_processing_log_has_key(self, pipeline_result, key):
+        """Test the processing log's top-level keys."""
+        with open(pipeline_result["processing_log_path"]) as f:
             log_data = json.load(f)
         
-        assert "timestamp" in log_data
-        assert "total_time_seconds" in log_data
-        assert "agent_results" in log_data
+        assert key in log_data
 
 
+class TestConfigLoading:
+    """Test configuration loading."""
+    
+    def test_config_parsed_once_and_copied(self):
+        """Test that orchestrators share one parse but not the config dict."""
+        _load_config_cached.cache_clear()
+        first = VideoPipelineOrchestrator()
+        second = VideoPipelineOrchestrator()
+        
+        assert _load_config_cached.cache_info().misses == 1
+        first.config["audio"]["highpass_hz"] = 100
+        assert second.config["audio"]["highpass_hz"] != 100
+
+
+class _FakeJsonSchemaException(ValueError):
+    """fastjsonschema.JsonSchemaException stand-in (carries .message)."""
+    
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def _fake_fastjsonschema_compile(schema):
+    """Compile a validator that only checks top-level required keys."""
+    def validate(data):
+        missing = [key for key in schema.get("required", []) if key not in data]
+        if missing:
+            raise _FakeJsonSchemaException(f"data must contain {missing} properties")
+        return data
+    
+    return validate
+
+
+_FAKE_FASTJSONSCHEMA = SimpleNamespace(
+    compile=_fake_fastjsonschema_compile,
+    JsonSchemaException=_FakeJsonSchemaException,
+)
+
+
+@pytest.fixture
+def fresh_validator_cache():
+    """Compile the schema again under whichever validator library a test installs."""
+    _get_validator.cache_clear()
+    yield
+    _get_validator.cache_clear()
+
+
+def _fake_jsonschema(errors):
+    """jsonschema stand-in whose validator reports the given errors."""
+    validator_cls = MagicMock()
+    validator_cls.return_value.iter_errors.return_value = errors
+    return SimpleNamespace(
+        validators=SimpleNamespace(validator_for=MagicMock(return_value=validator_cls)),
+        exceptions=SimpleNamespace(best_match=lambda errs: next(iter(errs), None)),
+    )
+
+
+@pytest.mark.usefixtures("fresh_validator_cache")
 class TestConfigValidation:
     """Test configuration validation."""
     
+    def test_fastjsonschema_accepts_valid_config(self):
+        """Test the fastjsonschema branch passes a valid config."""
+        with patch.dict(sys.modules, {"fastjsonschema": _FAKE_FASTJSONSCHEMA}):
+            orchestrator = VideoPipelineOrchestrator(config=_VALID_CONFIG)
+        
+        assert orchestrator.config == _VALID_CONFIG
+    
+    def test_fastjsonschema_rejects_invalid_config(self):
+        """Test the fastjsonschema branch turns its exception into ValueError."""
+        with patch.dict(sys.modules, {"fastjsonschema": _FAKE_FASTJSONSCHEMA}), \
+             pytest.raises(ValueError, match="Config validation failed: data must contain"):
+            VideoPipelineOrchestrator(config={"invalid": True})
+    
+    def test_jsonschema_fallback_rejects_invalid_config(self):
+        """Test the jsonschema branch (no fastjsonschema) reports the best-matching error."""
+        fake_jsonschema = _fake_jsonschema([SimpleNamespace(message="'audio' is a required property")])
+        
+        with patch.dict(sys.modules, {"fastjsonschema": None, "jsonschema": fake_jsonschema}), \
+             pytest.raises(ValueError, match="Config validation failed: 'audio' is a required property"):
+            VideoPipelineOrchestrator(config={"invalid": True})
+        
+        validator_cls = fake_jsonschema.validators.validator_for.return_value
+        validator_cls.check_schema.assert_called_once()
+    
+    def test_jsonschema_fallback_accepts_valid_config(self):
+        """Test the jsonschema branch passes a config with no errors."""
+        with patch.dict(sys.modules, {"fastjsonschema": None, "jsonschema": _fake_jsonschema([])}):
+            VideoPipelineOrchestrator(config=_VALID_CONFIG)
+    
+    def test_no_validator_library_skips_validation(self):
+        """Test that without either library the config is accepted unvalidated."""
+        with patch.dict(sys.modules, {"fastjsonschema": None, "jsonschema": None}):
+            orchestrator = VideoPipelineOrchestrator(config={"invalid": True})
+        
+        assert orchestrator.config == {"invalid": True}
+    
+    def test_config_dict_is_validated(self):
+        """Test that a config passed as a dict is validated like a file."""
+        pytest.importorskip("jsonschema")
+        with pytest.raises(ValueError):
+            VideoPipelineOrchestrator(config={"invalid": True})
+    
     def test_invalid_config_raises_error(self, tmp_path):
         """Test that invalid config raises ValueError."""
-        from execution.antigravity_pipeline import VideoPipelineOrchestrator
-        
         # Create invalid config
         config = {"invalid": True}  # Missing required fields
         config_path = tmp_path / "bad_config.json"
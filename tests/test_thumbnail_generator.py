@@ -1,71 +1,80 @@
 #!/usr/bin/env python3
 """Unit tests for ThumbnailGeneratorAgent."""
 
+import os
+import sys
 import pytest
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
+from execution.agents.thumbnail_generator import ThumbnailGeneratorAgent
+
+# Results of mocked subprocess.run calls; the agent only reads returncode/stdout/stderr
+_OK = SimpleNamespace(returncode=0, stdout="", stderr="")
+_PROBE_60S = SimpleNamespace(returncode=0, stdout="60.0", stderr="")
+_PROBE_600S = SimpleNamespace(returncode=0, stdout="600.0", stderr="")
+
 
 class TestThumbnailGeneratorAgent:
     """Tests for ThumbnailGeneratorAgent."""
     
-    @pytest.fixture
-    def agent(self):
-        """Create agent with default config."""
-        from execution.agents.thumbnail_generator import ThumbnailGeneratorAgent
-        return ThumbnailGeneratorAgent({
-            "count": 6,
-            "width": 1280,
-            "height": 720,
-            "format": "jpg",
-            "quality": 95,
-        })
+    CONFIG = {
+        "count": 6,
+        "width": 1280,
+        "height": 720,
+        "format": "jpg",
+        "quality": 95,
+    }
     
-    def test_calculate_timestamps_even_distribution(self, agent):
-        """Test that timestamps are evenly distributed."""
-        timestamps = agent._calculate_timestamps(duration=100, count=6)
-        
-        assert len(timestamps) == 6
-        # Should be roughly evenly spaced
-        assert timestamps[0] > 0  # Not at very beginning
-        assert timestamps[-1] < 100  # Not at very end
+    @pytest.fixture(scope="module")
+    def agent(self):
+        """Create agent with default config, shared by the tests that only read it."""
+        return ThumbnailGeneratorAgent(dict(self.CONFIG))
     
-    def test_calculate_timestamps_single(self, agent):
-        """Test single thumbnail is at middle."""
-        timestamps = agent._calculate_timestamps(duration=100, count=1)
-        
-        assert len(timestamps) == 1
-        assert timestamps[0] == 50  # Middle of video
+    @pytest.fixture
+    def fresh_agent(self):
+        """Create a per-test agent for tests that change its config."""
+        return ThumbnailGeneratorAgent(dict(self.CONFIG))
     
-    def test_calculate_timestamps_zero_count(self, agent):
-        """Test zero count returns empty list."""
-        timestamps = agent._calculate_timestamps(duration=100, count=0)
-        assert timestamps == []
+    @pytest.mark.parametrize("count, check", [
+        # Evenly spread, but not at the very beginning or end
+        (6, lambda ts: len(ts) == 6 and 0 < ts[0] and ts[-1] < 100),
+        # A single thumbnail sits at the middle
+        (1, lambda ts: ts == [50]),
+        (0, lambda ts: ts == []),
+    ], ids=["even_distribution", "single", "zero_count"])
+    def test_calculate_timestamps(self, agent, count, check):
+        """Test timestamp placement for a 100 s video."""
+        timestamps = agent._calculate_timestamps(duration=100, count=count)
+        assert check(timestamps), timestamps
     
     def test_get_output_extension(self, agent):
         """Test file extension mapping."""
         assert agent._get_output_extension() == ".jpg"
         
-        from execution.agents.thumbnail_generator import ThumbnailGeneratorAgent
         png_agent = ThumbnailGeneratorAgent({"format": "png"})
         assert png_agent._get_output_extension() == ".png"
     
+    def test_scale_filter_skips_pad_for_matching_aspect(self, agent):
+        """Test that pad is only added when the source aspect differs."""
+        assert "pad=" not in agent._scale_filter(1280, 720, (1920, 1080))
+        assert "pad=" in agent._scale_filter(1280, 720, (1080, 1920))
+        assert "pad=" in agent._scale_filter(1280, 720)
+    
     def test_process_creates_thumbnails_dir(self, agent, tmp_path):
         """Test that thumbnails subdirectory is created."""
         input_file = tmp_path / "input.mp4"
         input_file.touch()
         output_dir = tmp_path / "output"
+        thumb_paths = [str(output_dir / "thumbnails" / f"thumb_{i:02d}.jpg") for i in range(1, 7)]
         
         with patch("subprocess.run") as mock_run:
-            mock_run.return_value = MagicMock(returncode=0, stdout="60.0")
-            
-            # Mock thumbnail creation
+            # Mock thumbnail creation; the agent has made the directory before any ffmpeg call
             def create_thumb(*args, **kwargs):
-                thumb_dir = output_dir / "thumbnails"
-                thumb_dir.mkdir(parents=True, exist_ok=True)
-                for i in range(1, 7):
-                    (thumb_dir / f"thumb_{i:02d}.jpg").touch()
-                return MagicMock(returncode=0, stdout="60.0")
+                for path in thumb_paths:
+                    os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o644))
+                return _PROBE_60S
             
             mock_run.side_effect = create_thumb
             
@@ -78,3 +87,108 @@ class TestThumbnailGeneratorAgent:
         assert len(result["details"]) > 0
         assert "score" in result["details"][0]
         assert isinstance(result["details"][0]["score"], float)
+    
+    def test_long_video_seeks_per_thumbnail(self, agent, tmp_path):
+        """Test that long videos extract each thumbnail with its own seek."""
+        input_file = tmp_path / "input.mp4"
+        input_file.touch()
+        output_dir = tmp_path / "output"
+        
+        def fake_run(cmd, *args, **kwargs):
+            if cmd[0] == "ffmpeg":
+                Path(cmd[-1]).touch()
+            return _PROBE_600S
+        
+        with patch("subprocess.run", side_effect=fake_run) as mock_run:
+            result = agent.process(str(input_file), str(output_dir))
+        
+        seek_calls = [c for c in mock_run.call_args_list if "-ss" in c[0][0]]
+        assert len(seek_calls) == 6
+        assert result["count"] == 6
+    
+    @pytest.mark.parametrize("single_pass_frames, returncode", [(6, 1), (5, 0)], ids=["ffmpeg_failed", "short_count"])
+    def test_single_pass_falls_back_to_seeking(self, agent, tmp_path, single_pass_frames, returncode):
+        """Test that a failed or short single pass is redone per timestamp, ignoring stale files."""
+        input_file = tmp_path / "input.mp4"
+        input_file.touch()
+        thumb_dir = tmp_path / "output" / "thumbnails"
+        thumb_dir.mkdir(parents=True)
+        for i in range(1, 7):
+            (thumb_dir / f"thumb_{i:02d}.jpg").write_bytes(b"stale")
+        
+        def fake_run(cmd, *args, **kwargs):
+            if "-ss" in cmd:
+                Path(cmd[-1]).write_bytes(b"seeked")
+            else:
+                for i in range(1, single_pass_frames + 1):
+                    (thumb_dir / f"thumb_{i:02d}.jpg").write_bytes(b"single")
+            return SimpleNamespace(returncode=returncode if "-ss" not in cmd else 0, stdout="", stderr="")
+        
+        with patch("subprocess.run", side_effect=fake_run) as mock_run:
+            result = agent.process(str(input_file), str(tmp_path / "output"), video_duration=60.0)
+        
+        seek_calls = [c for c in mock_run.call_args_list if "-ss" in c[0][0]]
+        assert len(seek_calls) == 6
+        assert result["count"] == 6
+        assert all(Path(p).read_bytes() == b"seeked" for p in result["thumbnail_paths"])
+    
+    def test_single_pass_ignores_stale_thumbnails(self, agent, tmp_path):
+        """Test that thumbnails left by an earlier run don't count toward a single pass."""
+        thumb_dir = tmp_path / "thumbnails"
+        thumb_dir.mkdir()
+        for i in range(1, 7):
+            (thumb_dir / f"thumb_{i:02d}.jpg").write_bytes(b"stale")
+        
+        with patch("subprocess.run", return_value=_OK):
+            out_paths = agent._extract_thumbnails_single_pass(
+                tmp_path / "input.mp4", [1.0, 2.0, 3.0, 4.0, 5.0, 6.0], thumb_dir, ".jpg", 1280, 720
+            )
+        
+        assert out_paths is None
+        assert list(thumb_dir.iterdir()) == []
+    
+    def test_known_duration_skips_ffprobe(self, agent, tmp_path):
+        """Test that a video_duration passed to process() avoids the ffprobe call."""
+        input_file = tmp_path / "input.mp4"
+        input_file.touch()
+        output_dir = tmp_path / "output"
+        
+        def fake_run(cmd, *args, **kwargs):
+            for i in range(1, 7):
+                (output_dir / "thumbnails" / f"thumb_{i:02d}.jpg").touch()
+            return _OK
+        
+        with patch("subprocess.run", side_effect=fake_run) as mock_run:
+            result = agent.process(str(input_file), str(output_dir), video_duration=60.0)
+        
+        assert all(c[0][0][0] != "ffprobe" for c in mock_run.call_args_list)
+        assert mock_run.call_count == 1
+        assert result["count"] == 6
+    
+    def test_score_is_normalized_laplacian_variance(self, agent, tmp_path):
+        """Test sharpness scoring on a downscaled grayscale frame."""
+        fake_cv2 = MagicMock()
+        fake_cv2.imread.return_value = MagicMock(shape=(720, 1280))
+        fake_cv2.Laplacian.return_value.var.return_value = 1000.0
+        
+        with patch.dict(sys.modules, {"cv2": fake_cv2}):
+            score = agent._calculate_score(tmp_path / "thumb_01.jpg")
+        
+        assert score == 0.5
+        assert fake_cv2.resize.call_args[0][1] == (320, 180)
+    
+    def test_contact_sheet_in_same_pass(self, agent, tmp_path):
+        """Test the contact sheet is a second output of the single decode pass."""
+        with patch("subprocess.run") as mock_run:
+            mock_run.return_value = _OK
+            agent._extract_thumbnails_single_pass(
+                tmp_path / "input.mp4", [1.0, 2.0, 3.0, 4.0, 5.0, 6.0], tmp_path, ".jpg",
+                1280, 720, contact_sheet_path=tmp_path / "contact_sheet.jpg"
+            )
+        
+        assert mock_run.call_count == 1
+        cmd = mock_run.call_args[0][0]
+        assert "tile=3x2" in cmd[cmd.index("-filter_complex") + 1]
+        # Global options precede the input; nothing may trail the last output
+        assert cmd.index("-loglevel") < cmd.index("-i")
+        assert cmd[-1] == str(tmp_path / "contact_sheet.jpg")
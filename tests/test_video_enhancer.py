@@ -1,25 +1,38 @@
 #!/usr/bin/env python3
 """Unit tests for VideoEnhancerAgent."""
 
+import subprocess
 import pytest
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from execution.agents.video_enhancer import VideoEnhancerAgent, _ENCODER_CACHE
+
+# Result of a mocked subprocess.run; the agent only reads returncode/stdout/stderr
+_OK = SimpleNamespace(returncode=0, stdout="", stderr="")
 
 
 class TestVideoEnhancerAgent:
     """Tests for VideoEnhancerAgent."""
     
-    @pytest.fixture
+    CONFIG = {
+        "lut_path": None,
+        "output_codec": "h264",
+        "crf": 18,
+        "hardware_acceleration": False,
+        "software_encoder": "libx264",
+    }
+    
+    @pytest.fixture(scope="module")
     def agent(self):
-        """Create agent with default config."""
-        from execution.agents.video_enhancer import VideoEnhancerAgent
-        return VideoEnhancerAgent({
-            "lut_path": None,
-            "output_codec": "h264",
-            "crf": 18,
-            "hardware_acceleration": False,
-            "software_encoder": "libx264",
-        })
+        """Create agent with default config, shared by the tests that only read it."""
+        return VideoEnhancerAgent(dict(self.CONFIG))
+    
+    @pytest.fixture
+    def fresh_agent(self):
+        """Create a per-test agent for tests that change its config."""
+        return VideoEnhancerAgent(dict(self.CONFIG))
     
     def test_get_encoder_args_software(self, agent):
         """Test software encoder argument generation."""
@@ -45,10 +58,39 @@ class TestVideoEnhancerAgent:
         assert "lut3d=" in filter_str
         assert "trilinear" in filter_str
     
+    def test_build_video_filter_with_subtitles(self, agent, tmp_path):
+        """Test subtitles are burned in as the last filter."""
+        lut_file = tmp_path / "test.cube"
+        lut_file.touch()
+
+        filter_str = agent._build_video_filter(lut_file, "C:\\captions\\video.srt")
+
+        assert filter_str.startswith("lut3d=")
+        assert ",subtitles='C\\:/captions/video.srt':force_style=" in filter_str
+        assert "FontSize=24" in filter_str
+
+    @patch("subprocess.run")
+    def test_process_subtitle_path_from_config(self, mock_run, fresh_agent, tmp_path):
+        """Test that process() falls back to the subtitle_path config key."""
+        input_file = tmp_path / "input.mp4"
+        input_file.touch()
+        fresh_agent.config["subtitle_path"] = str(tmp_path / "captions.srt")
+
+        def create_output(*args, **kwargs):
+            (tmp_path / "input_enhanced.mp4").touch()
+            return _OK
+
+        mock_run.side_effect = create_output
+        result = fresh_agent.process(str(input_file), str(tmp_path))
+
+        cmd = mock_run.call_args[0][0]
+        assert "captions.srt" in cmd[cmd.index("-vf") + 1]
+        assert result["captions_burned"] is True
+
     def test_supported_lut_formats(self, agent):
         """Test LUT format validation."""
-        assert ".cube" in agent.SUPPORTED_LUT_FORMATS
-        assert ".3dl" in agent.SUPPORTED_LUT_FORMATS
+        missing = [ext for ext in (".cube", ".3dl") if ext not in agent.SUPPORTED_LUT_FORMATS]
+        assert not missing, f"missing: {missing}"
         assert ".mp4" not in agent.SUPPORTED_LUT_FORMATS
     
     @patch("subprocess.run")
@@ -57,11 +99,10 @@ class TestVideoEnhancerAgent:
         input_file = tmp_path / "input.mp4"
         input_file.touch()
         output_dir = tmp_path / "output"
-        output_dir.mkdir()
         
         def create_output(*args, **kwargs):
             (output_dir / "input_enhanced.mp4").touch()
-            return MagicMock(returncode=0, stderr="")
+            return _OK
         
         mock_run.side_effect = create_output
         
@@ -70,10 +111,35 @@ class TestVideoEnhancerAgent:
         assert mock_run.called
         assert "ffmpeg" in mock_run.call_args[0][0]
     
+    @patch("subprocess.run")
+    def test_process_per_call_audio_and_subtitles(self, mock_run, agent, tmp_path):
+        """Test external audio and subtitles passed to process() leave config untouched."""
+        input_file = tmp_path / "input.mp4"
+        input_file.touch()
+        audio_file = tmp_path / "audio.flac"
+        audio_file.touch()
+
+        def create_output(*args, **kwargs):
+            (tmp_path / "input_enhanced.mp4").touch()
+            return _OK
+
+        mock_run.side_effect = create_output
+        config_before = dict(agent.config)
+
+        result = agent.process(
+            str(input_file), str(tmp_path),
+            external_audio_path=str(audio_file), subtitle_path=str(tmp_path / "captions.srt")
+        )
+
+        cmd = mock_run.call_args[0][0]
+        assert cmd[cmd.index("-i", cmd.index("-i") + 1) + 1] == str(audio_file)
+        assert "1:a:0" in cmd
+        assert "subtitles=" in cmd[cmd.index("-vf") + 1]
+        assert result["captions_burned"] is True
+        assert agent.config == config_before
+
     def test_hardware_fallback(self, tmp_path):
         """Test that hardware unavailable falls back to software."""
-        from execution.agents.video_enhancer import VideoEnhancerAgent
-        
         agent = VideoEnhancerAgent({
             "hardware_acceleration": True,
             "hardware_encoder": "nonexistent_encoder",
@@ -83,9 +149,112 @@ class TestVideoEnhancerAgent:
         
         with patch("subprocess.run") as mock_run:
             # Mock encoder check to fail
-            mock_run.return_value = MagicMock(returncode=0, stdout="")
+            mock_run.return_value = _OK
             
             args = agent._get_encoder_args()
             
             # Should fall back to software
             assert "libx264" in args
+    
+    def test_encoder_check_cached(self, tmp_path):
+        """Test that ffmpeg -encoders is only spawned once per encoder name."""
+        agent = VideoEnhancerAgent({
+            "hardware_acceleration": True,
+            "hardware_encoder": "h264_nvenc",
+        })
+        
+        with patch.dict(_ENCODER_CACHE, clear=True), patch("subprocess.run") as mock_run:
+            mock_run.return_value = SimpleNamespace(returncode=0, stdout=" V....D h264_nvenc", stderr="")
+            
+            agent._get_encoder_args()
+            agent._get_encoder_args()
+            
+            assert mock_run.call_count == 1
+            assert agent._encoder_used == "h264_nvenc"
+    
+    def test_encoder_check_failure_not_cached(self):
+        """Test that a timed-out encoder listing is retried instead of disabling hardware."""
+        agent = VideoEnhancerAgent({
+            "hardware_acceleration": True,
+            "hardware_encoder": "h264_nvenc",
+        })
+        listing = SimpleNamespace(returncode=0, stdout=" V....D h264_nvenc", stderr="")
+        
+        with patch.dict(_ENCODER_CACHE, clear=True), patch("subprocess.run") as mock_run:
+            mock_run.side_effect = [subprocess.TimeoutExpired("ffmpeg", 5), listing]
+            
+            assert agent._check_hardware_encoder() is False
+            assert agent._check_hardware_encoder() is True
+            assert mock_run.call_count == 2
+    
+    def test_hwaccel_decode_matches_hardware_encoder(self):
+        """Test that decode stays on the encoder's device unless CPU filters run."""
+        agent = VideoEnhancerAgent({
+            "hardware_acceleration": True,
+            "hardware_encoder": "h264_nvenc",
+        })
+        
+        with patch.object(agent, "_check_hardware_encoder", return_value=True):
+            agent._get_encoder_args()
+        
+        assert agent._get_decoder_args("") == ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
+        assert agent._get_decoder_args("eq=contrast=1.1") == ["-hwaccel", "cuda"]
+        
+        agent.config["hardware_decode"] = False
+        assert agent._get_decoder_args("") == []
+    
+    @patch("subprocess.run")
+    def test_vaapi_with_lut_uploads_filtered_frames(self, mock_run, tmp_path):
+        """Test that CPU-filtered frames are uploaded to the VAAPI device before h264_vaapi."""
+        input_file = tmp_path / "input.mp4"
+        input_file.touch()
+        lut_file = tmp_path / "grade.cube"
+        lut_file.touch()
+        agent = VideoEnhancerAgent({
+            "hardware_acceleration": True,
+            "hardware_encoder": "h264_vaapi",
+            "lut_path": str(lut_file),
+        })
+        
+        def create_output(*args, **kwargs):
+            (tmp_path / "input_enhanced.mp4").touch()
+            return _OK
+        
+        mock_run.side_effect = create_output
+        with patch.object(agent, "_check_hardware_encoder", return_value=True):
+            result = agent.process(str(input_file), str(tmp_path))
+        
+        assert result["success"] is True
+        cmd = mock_run.call_args[0][0]
+        pre_input = cmd[:cmd.index("-i")]
+        assert pre_input[pre_input.index("-init_hw_device") + 1] == "vaapi=hw"
+        assert pre_input[pre_input.index("-filter_hw_device") + 1] == "hw"
+        assert pre_input[pre_input.index("-hwaccel") + 1] == "vaapi"
+        assert "-hwaccel_output_format" not in cmd
+        vf = cmd[cmd.index("-vf") + 1]
+        assert vf.startswith("lut3d=")
+        assert vf.endswith(",format=nv12,hwupload")
+        assert cmd[cmd.index("-c:v") + 1] == "h264_vaapi"
+    
+    def test_qsv_without_hw_decode_still_uploads(self):
+        """Test that QSV encoding with CPU decode and no filters still gets a hwupload device."""
+        agent = VideoEnhancerAgent({
+            "hardware_acceleration": True,
+            "hardware_encoder": "h264_qsv",
+            "hardware_decode": False,
+        })
+        with patch.object(agent, "_check_hardware_encoder", return_value=True):
+            agent._get_encoder_args()
+        
+        assert agent._needs_hwupload("") is True
+        assert agent._get_decoder_args("") == ["-init_hw_device", "qsv=hw", "-filter_hw_device", "hw"]
+    
+    def test_decoder_args_before_encoder_chosen(self):
+        """Test that decode args are empty (not an error) before an encoder is picked."""
+        agent = VideoEnhancerAgent({"hardware_acceleration": True, "hardware_encoder": "h264_nvenc"})
+        assert agent._get_decoder_args("") == []
+    
+    def test_software_encode_uses_cpu_decode(self, agent):
+        """Test that no -hwaccel is added when encoding in software."""
+        agent._get_encoder_args()
+        assert agent._get_decoder_args("") == []